@@ -0,0 +1,206 @@
+import argparse
+import csv
+import json
+import os
+import random
+import resource
+import sys
+import time
+from bisect import bisect
+from itertools import accumulate
+
+import degrees
+
+FIRST_NAMES = [
+    "James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael",
+    "Linda", "William", "Elizabeth", "David", "Barbara", "Richard", "Susan",
+    "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen", "Emma",
+    "Olivia", "Noah", "Liam", "Sophia", "Ava", "Lucas", "Mia", "Hugo", "Léa",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller",
+    "Davis", "Rodriguez", "Martinez", "Hernandez", "Lopez", "Gonzalez",
+    "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+    "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark",
+    "Ramirez", "Lewis", "Robinson", "Walker", "Young", "Allen", "King",
+]
+
+# Search modes of shortest_path the benchmark can run
+MODES = {
+    "bfs": {},
+    "bidirectional": {"bidirectional": True},
+    "cached": {"cached": True},
+    "guided": {"guided": True},
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic degrees data and benchmark it."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = commands.add_parser(
+        "generate", help="write synthetic people, movies and stars CSV files"
+    )
+    generate_parser.add_argument("directory")
+    generate_parser.add_argument("--people", type=int, default=100000)
+    generate_parser.add_argument("--movies", type=int, default=50000)
+    generate_parser.add_argument(
+        "--cast", type=float, default=6.0, help="mean cast size per movie"
+    )
+    generate_parser.add_argument(
+        "--alpha", type=float, default=2.2,
+        help="power-law exponent of the number of movies per person"
+    )
+    generate_parser.add_argument("--seed", type=int, default=0)
+
+    run_parser = commands.add_parser(
+        "run", help="time loading and a reproducible query mix"
+    )
+    run_parser.add_argument("directory")
+    run_parser.add_argument("--queries", type=int, default=200)
+    run_parser.add_argument(
+        "--modes", default="bidirectional,cached",
+        help=f"comma-separated search modes from: {', '.join(MODES)}"
+    )
+    run_parser.add_argument(
+        "--sources", type=int, default=8,
+        help="number of repeated sources in the query mix"
+    )
+    run_parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        counts = generate(
+            args.directory, args.people, args.movies,
+            cast=args.cast, alpha=args.alpha, seed=args.seed
+        )
+        print("Wrote {} people, {} movies and {} stars.".format(*counts))
+    else:
+        modes = args.modes.split(",")
+        for mode in modes:
+            if mode not in MODES:
+                sys.exit(f"Unknown mode: {mode}")
+        report = run(
+            args.directory, args.queries, modes,
+            sources=args.sources, seed=args.seed
+        )
+        print(json.dumps(report, indent=2))
+
+
+def generate(directory, num_people, num_movies, cast=6.0, alpha=2.2, seed=0):
+    """
+    Writes people.csv, movies.csv and stars.csv with IMDB-like shapes to
+    `directory`, reproducibly for a given `seed`.
+
+    Each person gets an activity weight from a power law with exponent
+    `alpha`, and each cast is drawn in proportion to those weights, so a
+    few people star in very many movies and most in one or two. Cast
+    sizes are geometric with mean `cast`. Names are drawn from short
+    lists, so many people share a name, as in the real data.
+
+    Returns the number of people, movies and star rows written.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+
+    person_ids = rng.sample(range(1, 10 * num_people + 1), num_people)
+    with open(os.path.join(directory, "people.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for person_id in person_ids:
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+            birth = rng.randint(1900, 2005) if rng.random() < 0.8 else ""
+            writer.writerow([person_id, name, birth])
+
+    movie_ids = rng.sample(range(1, 10 * num_movies + 1), num_movies)
+    with open(os.path.join(directory, "movies.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "title", "year"])
+        for number, movie_id in enumerate(movie_ids):
+            writer.writerow([movie_id, f"Movie {number}", rng.randint(1920, 2024)])
+
+    weights = [rng.paretovariate(alpha - 1) for _ in range(num_people)]
+    cumulative = list(accumulate(weights))
+    stars = 0
+    with open(os.path.join(directory, "stars.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        for movie_id in movie_ids:
+            size = 1
+            while rng.random() > 1 / cast:
+                size += 1
+            cast_members = {
+                bisect(cumulative, rng.random() * cumulative[-1])
+                for _ in range(size)
+            }
+            for member in cast_members:
+                writer.writerow([person_ids[min(member, num_people - 1)], movie_id])
+            stars += len(cast_members)
+    return num_people, num_movies, stars
+
+
+def query_mix(person_ids, count, sources=8, seed=0):
+    """
+    Returns `count` reproducible (source, target) pairs: half with
+    random sources, and half from a few repeated sources, as in
+    workloads asking many targets about the same people.
+    """
+    rng = random.Random(seed)
+    repeated = [rng.choice(person_ids) for _ in range(sources)]
+    pairs = []
+    for i in range(count):
+        source = rng.choice(repeated) if i % 2 else rng.choice(person_ids)
+        pairs.append((source, rng.choice(person_ids)))
+    return pairs
+
+
+def run(directory, queries, modes, sources=8, seed=0):
+    """
+    Loads `directory` twice, without and then with its snapshot, and
+    runs the same query mix with each search mode. Returns a report of
+    load times, graph size, peak memory, and per-mode throughput and
+    search counters.
+    """
+    stats = degrees.enable_stats()
+    report = {"directory": directory, "queries": queries}
+
+    degrees.load_data(directory, use_snapshot=False)
+    report["load_csv_seconds"] = stats.load_time
+    # The first load with snapshots enabled writes the snapshot, so only
+    # the second one measures loading from it
+    degrees.load_data(directory)
+    stats.reset()
+    degrees.load_data(directory)
+    report["load_snapshot_seconds"] = stats.load_time
+    report["people"] = degrees.graph.num_people()
+    report["movies"] = degrees.graph.num_movies()
+    report["graph_bytes"] = degrees.graph.nbytes()
+    if "guided" in modes:
+        degrees.load_landmarks(directory)
+
+    pairs = query_mix(degrees.graph.person_ids, queries, sources, seed)
+    report["modes"] = {}
+    for mode in modes:
+        degrees.tree_cache.clear()
+        stats.reset()
+        start = time.perf_counter()
+        lengths = [degrees.shortest_path(s, t, **MODES[mode]) for s, t in pairs]
+        elapsed = time.perf_counter() - start
+        report["modes"][mode] = {
+            "seconds": elapsed,
+            "queries_per_second": queries / elapsed if elapsed else None,
+            "connected": sum(path is not None for path in lengths),
+            **stats.as_dict()
+        }
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    report["peak_rss_bytes"] = peak if sys.platform == "darwin" else peak * 1024
+    degrees.disable_stats()
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+from collections import OrderedDict
+
+
+class LRUCache():
+    """
+    Least-recently-used cache bounded by a number of entries and,
+    optionally, by the total size of its values as measured by `sizeof`.
+    """
+
+    def __init__(self, max_entries=16, max_bytes=None, sizeof=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.entries = OrderedDict()
+        self.nbytes = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def keys(self):
+        return list(self.entries)
+
+    def get(self, key, default=None):
+        """
+        Returns the value for `key`, marking it as most recently used.
+        """
+        if key not in self.entries:
+            return default
+        self.entries.move_to_end(key)
+        return self.entries[key][0]
+
+    def put(self, key, value):
+        """
+        Stores `value` under `key`, then evicts least recently used
+        entries until the cache is within its bounds again. A value that
+        is larger than `max_bytes` on its own is not stored.
+        """
+        self.discard(key)
+        size = self.sizeof(value) if self.sizeof is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        self.entries[key] = (value, size)
+        self.nbytes += size
+        while len(self.entries) > self.max_entries or (
+            self.max_bytes is not None and self.nbytes > self.max_bytes
+        ):
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.nbytes -= evicted
+
+    def discard(self, key):
+        if key in self.entries:
+            _, size = self.entries.pop(key)
+            self.nbytes -= size
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
@@ -0,0 +1,98 @@
+import argparse
+import json
+import socket
+import sys
+
+# Default Unix socket of the server (see server.py)
+SOCKET = "degrees.sock"
+
+
+class Client():
+    """
+    Blocking client for a local degrees server (see server.py). Each
+    method sends one request and waits for its response.
+    """
+
+    def __init__(self, path=SOCKET, port=None):
+        if port is not None:
+            self.connection = socket.create_connection(("127.0.0.1", port))
+        else:
+            self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.connection.connect(path)
+        self.stream = self.connection.makefile("rwb")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.stream.close()
+        self.connection.close()
+
+    def request(self, message):
+        """
+        Sends `message` as one JSON line and returns the decoded response.
+        """
+        self.stream.write((json.dumps(message) + "\n").encode("utf-8"))
+        self.stream.flush()
+        line = self.stream.readline()
+        if not line:
+            raise ConnectionError("server closed the connection")
+        return json.loads(line)
+
+    def ping(self):
+        return self.request({"op": "ping"})
+
+    def lookup(self, name, limit=10):
+        return self.request({"op": "lookup", "name": name, "limit": limit})
+
+    def shortest_path(self, source, target, bidirectional=False, cached=False,
+                      guided=False):
+        return self.request({
+            "op": "path",
+            "source": source,
+            "target": target,
+            "bidirectional": bidirectional,
+            "cached": cached,
+            "guided": guided
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query a local degrees server.")
+    parser.add_argument("--socket", default=SOCKET)
+    parser.add_argument("--port", type=int, default=None)
+    commands = parser.add_subparsers(dest="command", required=True)
+    path = commands.add_parser("path", help="find the shortest path between two people")
+    path.add_argument("source")
+    path.add_argument("target")
+    path.add_argument("--bidirectional", action="store_true")
+    path.add_argument("--cached", action="store_true")
+    path.add_argument("--guided", action="store_true")
+    lookup = commands.add_parser("lookup", help="list the people best matching a name")
+    lookup.add_argument("name")
+    lookup.add_argument("--limit", type=int, default=10)
+    commands.add_parser("ping", help="check that the server is up")
+    args = parser.parse_args()
+
+    try:
+        client = Client(args.socket, args.port)
+    except OSError as e:
+        sys.exit(f"Could not connect to the server: {e}")
+    with client:
+        if args.command == "path":
+            response = client.shortest_path(
+                args.source, args.target, bidirectional=args.bidirectional,
+                cached=args.cached, guided=args.guided
+            )
+        elif args.command == "lookup":
+            response = client.lookup(args.name, args.limit)
+        else:
+            response = client.ping()
+    print(json.dumps(response))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import os
+import struct
+from array import array
+
+import snapshot
+
+# File written next to the CSVs of a data directory
+FILENAME = "degrees.components"
+
+# Bump whenever the layout below changes; older files are rebuilt
+VERSION = 1
+
+# The stamp of snapshot.STAMP and number of people, followed by one
+# int32 component id per person
+HEADER = struct.Struct(snapshot.STAMP + "q")
+MAGIC = b"COMPNTS\0"
+
+
+def component_ids(graph):
+    """
+    Returns an array('i') with the connected component of every person
+    in `graph`, numbered densely from 0, found by union-find over the
+    people starring in each movie.
+    """
+    n = graph.num_people()
+    parents = array("i", range(n))
+    sizes = array("i", [1]) * n
+
+    def find(person):
+        while parents[person] != person:
+            # Path halving: point every other step at its grandparent
+            parents[person] = parents[parents[person]]
+            person = parents[person]
+        return person
+
+    for movie in range(graph.num_movies()):
+        stars = graph.stars_of(movie)
+        if len(stars) < 2:
+            continue
+        root = find(stars[0])
+        for star in stars[1:]:
+            other = find(star)
+            if other == root:
+                continue
+            # Union by size, keeping the larger tree's root
+            if sizes[other] > sizes[root]:
+                root, other = other, root
+            parents[other] = root
+            sizes[root] += sizes[other]
+
+    ids = array("i", [-1]) * n
+    count = 0
+    for person in range(n):
+        root = find(person)
+        if ids[root] == -1:
+            ids[root] = count
+            count += 1
+        ids[person] = ids[root]
+    return ids
+
+
+def extend(ids, graph, movies):
+    """
+    Returns component ids for `graph` after new people and the edges of
+    `movies` were added to it, given the `ids` from before. Only the
+    components of people starring in `movies` can merge; new people
+    start in components of their own. Ids are no longer dense once
+    components have merged.
+    """
+    ids = array("i", ids)
+    label = max(ids, default=-1) + 1
+    while len(ids) < graph.num_people():
+        ids.append(label)
+        label += 1
+
+    parents = {}
+
+    def find(label):
+        while parents.get(label, label) != label:
+            label = parents[label]
+        return label
+
+    for movie in movies:
+        stars = graph.stars_of(movie)
+        if len(stars) < 2:
+            continue
+        root = find(ids[stars[0]])
+        for star in stars[1:]:
+            other = find(ids[star])
+            if other != root:
+                parents[other] = root
+
+    if parents:
+        relabel = {label: find(label) for label in parents}
+        ids = array("i", (relabel.get(label, label) for label in ids))
+    return ids
+
+
+def save(directory, ids):
+    """
+    Writes component ids next to the CSV files of `directory`, tagged
+    with their current mtime and size. Returns False if they could not
+    be written.
+    """
+    header = snapshot.stamp(HEADER, MAGIC, VERSION, directory, len(ids))
+    return snapshot.write_file(os.path.join(directory, FILENAME), [header, ids])
+
+
+def load(directory):
+    """
+    Memory-maps the component ids saved for `directory`, as an int32
+    view. Returns None if they are missing, or were saved by another
+    version or for CSV files that have since changed.
+    """
+    mapped = snapshot.map_file(
+        os.path.join(directory, FILENAME), HEADER, MAGIC, VERSION, directory
+    )
+    if mapped is None:
+        return None
+    data, (n,) = mapped
+    if len(data) != HEADER.size + 4 * n:
+        return None
+    return memoryview(data)[HEADER.size:].cast("i")
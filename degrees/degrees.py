@@ -1,21 +1,124 @@
+import argparse
 import csv
+import functools
+import json
+import math
+import multiprocessing
+import os
 import sys
+import time
+from array import array
+from collections import deque
+from itertools import compress
 
-from util import Node, StackFrontier, QueueFrontier
+import components
+import landmarks
+import snapshot
+from cache import LRUCache
+from graph import Graph
+from nameindex import NameIndex
+from searchstats import SearchStats
+from util import Node
 
 # Maps names to a set of corresponding person_ids
 names = {}
 
-# Maps person_ids to a dictionary of: name, birth, movies (a set of movie_ids)
+# Maps person_ids to a dictionary of: name, birth
 people = {}
 
-# Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
+# Maps movie_ids to a dictionary of: title, year
 movies = {}
 
+# Person <-> movie adjacency over integer-interned ids (see graph.py)
+graph = Graph()
 
-def load_data(directory):
+# Maps integer person ids to the BFS tree (see bfs_tree) rooted at them
+tree_cache = LRUCache(
+    max_entries=16,
+    max_bytes=256 * 1024 * 1024,
+    sizeof=lambda tree: sum(len(a) * a.itemsize for a in tree)
+)
+
+# Landmark distances used to bound and guide searches (see load_landmarks)
+landmark_index = None
+
+# Connected component of each integer person id (see load_components)
+component_ids = None
+
+# Ranked exact, prefix and fuzzy name lookups (see load_name_index)
+name_index = None
+
+# Search counters, only collected after enable_stats()
+stats = None
+
+
+def load_data(directory, use_snapshot=True):
     """
     Load data from CSV files into memory.
+
+    Unless `use_snapshot` is false, the parsed data is also saved to a
+    binary snapshot next to the CSV files, which later calls memory-map
+    instead of parsing the CSV files again, for as long as they are unchanged.
+    The connected components of the graph are cached the same way.
+    """
+    global landmark_index, name_index, names, people, movies
+    start = time.perf_counter()
+    landmark_index = None
+    name_index = None
+    tree_cache.clear()
+    names = {}
+    people = {}
+    movies = {}
+    if not (use_snapshot and load_snapshot(directory)):
+        load_csv(directory)
+        if use_snapshot:
+            snapshot.write(directory, people, movies, graph)
+    load_components(directory, persist=use_snapshot)
+    if stats is not None:
+        stats.load_time += time.perf_counter() - start
+
+
+def enable_stats():
+    """
+    Start collecting search counters and timings, and return the
+    SearchStats they are collected in.
+    """
+    global stats
+    stats = SearchStats()
+    return stats
+
+
+def disable_stats():
+    global stats
+    stats = None
+
+
+def record_search(expanded, pairs, frontier):
+    """
+    Adds the counts of one search to `stats`, if collecting.
+    """
+    if stats is not None:
+        stats.record(expanded, pairs, frontier)
+
+
+def listed_pairs(*flags):
+    """
+    Returns the number of (movie, person) neighbor pairs a search listed,
+    given the bytearrays in which it flagged each movie whose cast it
+    listed (see `Graph.neighbors`). Only called while collecting, so
+    that searches do not count pairs one by one.
+    """
+    offsets = graph.movie_offsets
+    return sum(
+        offsets[movie + 1] - offsets[movie]
+        for expanded in flags
+        for movie in compress(range(len(expanded)), expanded)
+    )
+
+
+def load_csv(directory):
+    """
+    Parse the CSV files of `directory` into memory.
     """
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
@@ -23,8 +126,7 @@ def load_data(directory):
         for row in reader:
             people[row["id"]] = {
                 "name": row["name"],
-                "birth": row["birth"],
-                "movies": set()
+                "birth": row["birth"]
             }
             if row["name"].lower() not in names:
                 names[row["name"].lower()] = {row["id"]}
@@ -37,29 +139,277 @@ def load_data(directory):
         for row in reader:
             movies[row["id"]] = {
                 "title": row["title"],
-                "year": row["year"],
-                "stars": set()
+                "year": row["year"]
             }
 
     # Load stars
+    graph.intern(people, movies)
+    star_people = array("i")
+    star_movies = array("i")
     with open(f"{directory}/stars.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         for row in reader:
             try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
+                person = graph.person_index[row["person_id"]]
+                movie = graph.movie_index[row["movie_id"]]
             except KeyError:
-                pass
+                continue
+            star_people.append(person)
+            star_movies.append(movie)
+    graph.connect(star_people, star_movies)
+
+
+def load_snapshot(directory):
+    """
+    Load data from the binary snapshot of `directory` into memory.
+    Returns False, without loading anything, if the snapshot is
+    missing or out of date.
+
+    Nothing is decoded up front: `names`, `people` and `movies` look
+    their entries up in the mapped string tables as they are used.
+    """
+    global names, people, movies
+    data = snapshot.read(directory)
+    if data is None:
+        return False
+    arrays, tables, orders = data
+    person_ids, person_names, births, movie_ids, titles, years = tables
+    person_order, movie_order, name_order = orders
+
+    person_index = snapshot.TableIndex(person_ids, person_order)
+    movie_index = snapshot.TableIndex(movie_ids, movie_order)
+    people = snapshot.MappedRecords(
+        person_ids, person_index, {"name": person_names, "birth": births}
+    )
+    movies = snapshot.MappedRecords(
+        movie_ids, movie_index, {"title": titles, "year": years}
+    )
+    names = snapshot.MappedNames(person_ids, person_names, name_order)
+    graph.assign(
+        person_ids, movie_ids, *arrays,
+        person_index=person_index, movie_index=movie_index
+    )
+    return True
+
+
+def ingest(directory, delta_directory):
+    """
+    Apply new rows from any of the people.csv, movies.csv and stars.csv
+    files of `delta_directory` to the data loaded from `directory`,
+    without reloading it. The rows are appended to the CSV files of
+    `directory`, and its snapshot and components are rewritten to match.
+    Returns the number of rows applied from each file.
+    """
+    delta = []
+    for filename in snapshot.CSV_FILES:
+        path = os.path.join(delta_directory, filename)
+        if not os.path.exists(path):
+            delta.append([])
+            continue
+        with open(path, encoding="utf-8") as f:
+            delta.append(list(csv.DictReader(f)))
+
+    for filename, rows in zip(snapshot.CSV_FILES, delta):
+        append_rows(os.path.join(directory, filename), rows)
+    apply_delta(*delta)
+
+    if os.path.exists(snapshot.path_for(directory)):
+        snapshot.write(directory, people, movies, graph)
+    if component_ids is not None:
+        components.save(directory, component_ids)
+    return tuple(len(rows) for rows in delta)
+
+
+def append_rows(path, rows):
+    """
+    Appends `rows` (dictionaries keyed by the header) to the CSV file
+    at `path`.
+    """
+    if not rows:
+        return
+    with open(path, "rb") as f:
+        header = f.readline().decode("utf-8").strip()
+        f.seek(0, os.SEEK_END)
+        ends_with_newline = True
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            ends_with_newline = f.read(1) == b"\n"
+    with open(path, "a", encoding="utf-8", newline="") as f:
+        if not ends_with_newline:
+            f.write("\n")
+        writer = csv.DictWriter(f, fieldnames=next(csv.reader([header])))
+        writer.writerows(rows)
+
+
+def apply_delta(people_rows=(), movie_rows=(), star_rows=()):
+    """
+    Patch the loaded data with new CSV rows, as dictionaries keyed like
+    the CSV headers. People and movies whose id is already loaded have
+    their details replaced, as a full reload would. Integer ids of
+    existing people and movies stay the same. Star rows loaded earlier
+    that named people or movies unknown at the time are not revisited.
+
+    Only cached data the new edges can affect is dropped: BFS trees that
+    reach anyone starring in an updated movie, and the component ids of
+    people starring in them, which are merged. The landmark index and
+    name index are dropped, to be rebuilt when next needed.
+    """
+    global component_ids, landmark_index, name_index
+    new_people = []
+    for row in people_rows:
+        if row["id"] in people:
+            names[people[row["id"]]["name"].lower()].discard(row["id"])
+        else:
+            new_people.append(row["id"])
+        people[row["id"]] = {
+            "name": row["name"],
+            "birth": row["birth"]
+        }
+        names.setdefault(row["name"].lower(), set()).add(row["id"])
+
+    new_movies = []
+    for row in movie_rows:
+        if row["id"] not in movies:
+            new_movies.append(row["id"])
+        movies[row["id"]] = {
+            "title": row["title"],
+            "year": row["year"]
+        }
+
+    graph.append(new_people, new_movies)
+    star_people = array("i")
+    star_movies = array("i")
+    for row in star_rows:
+        try:
+            person = graph.person_index[row["person_id"]]
+            movie = graph.movie_index[row["movie_id"]]
+        except KeyError:
+            continue
+        star_people.append(person)
+        star_movies.append(movie)
+    graph.add_edges(star_people, star_movies)
+
+    updated = set(star_movies)
+    touched = {star for movie in updated for star in graph.stars_of(movie)}
+    for root in tree_cache.keys():
+        parents, _ = tree_cache.get(root)
+        if any(person < len(parents) and parents[person] != -1 for person in touched):
+            tree_cache.discard(root)
+
+    if component_ids is not None:
+        component_ids = components.extend(component_ids, graph, updated)
+    landmark_index = None
+    name_index = None
+
+
+def load_components(directory, persist=True):
+    """
+    Load the connected component of every person, saved next to the CSV
+    files of `directory`, computing them if they are missing or out of
+    date and, if `persist` is true, saving them.
+    """
+    global component_ids
+    ids = components.load(directory) if persist else None
+    if ids is None or len(ids) != graph.num_people():
+        ids = components.component_ids(graph)
+        if persist:
+            components.save(directory, ids)
+    component_ids = ids
+
+
+def connected(source, target):
+    """
+    Returns whether two person ids are in the same connected component,
+    in O(1). Returns True when no component ids are loaded.
+    """
+    if component_ids is None:
+        return True
+    return (
+        component_ids[graph.person_index[source]]
+        == component_ids[graph.person_index[target]]
+    )
+
+
+def load_landmarks(directory, count=16):
+    """
+    Load the landmark index saved next to the CSV files of `directory`,
+    building and saving one with `count` landmarks if it is missing or
+    out of date. Must be called after `load_data`.
+    """
+    global landmark_index
+    index = landmarks.LandmarkIndex.load(directory)
+    if index is None or len(index.distances[0]) != graph.num_people():
+        index = landmarks.LandmarkIndex.build(graph, count)
+        index.save(directory)
+    landmark_index = index
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser(
+        description="Find the degrees of separation between two people."
+    )
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument(
+        "--ingest", metavar="DIRECTORY",
+        help="append the rows of the CSV files in DIRECTORY to the data "
+             "and update its snapshot and indexes, then exit"
+    )
+    parser.add_argument(
+        "--batch", metavar="FILE",
+        help="answer tab-separated source/target lines from FILE "
+             "('-' for stdin) and write JSONL results to stdout"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="number of worker processes for --batch (default: all cores)"
+    )
+    parser.add_argument(
+        "--bidirectional", action="store_true",
+        help="search from both ends at once"
+    )
+    parser.add_argument(
+        "--cached", action="store_true",
+        help="answer from cached per-source BFS trees"
+    )
+    parser.add_argument(
+        "--guided", action="store_true",
+        help="guide the search with a landmark index, building it if needed"
+    )
+    args = parser.parse_args()
+
+    if args.ingest is not None:
+        print("Loading data...")
+        load_data(args.directory)
+        counts = ingest(args.directory, args.ingest)
+        print("Added {} people, {} movies and {} stars.".format(*counts))
+        return
+
+    if args.batch is not None:
+        # Keep stdout for the JSONL results
+        print("Loading data...", file=sys.stderr)
+        load_data(args.directory)
+        if args.guided:
+            load_landmarks(args.directory)
+        print("Data loaded.", file=sys.stderr)
+        if args.batch == "-":
+            lines = sys.stdin
+        else:
+            lines = open(args.batch, encoding="utf-8")
+        with lines:
+            results = run_batch(
+                read_pairs(lines), args.directory,
+                workers=args.workers, bidirectional=args.bidirectional,
+                cached=args.cached, guided=args.guided
+            )
+            for result in results:
+                print(json.dumps(result))
+        return
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    load_data(args.directory)
+    if args.guided:
+        load_landmarks(args.directory)
     print("Data loaded.")
 
     source = person_id_for_name(input("Name: "))
@@ -69,7 +419,10 @@ def main():
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    path = shortest_path(
+        source, target, bidirectional=args.bidirectional, cached=args.cached,
+        guided=args.guided
+    )
 
     if path is None:
         print("Not connected.")
@@ -84,43 +437,582 @@ def main():
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def read_pairs(lines):
+    """
+    Yields (source, target) pairs from tab-separated lines, skipping
+    blank lines and lines starting with '#'. Each side may be an IMDB
+    person id or a name.
+    """
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        source, _, target = line.partition("\t")
+        yield source.strip(), target.strip()
+
+
+def run_batch(pairs, directory, workers=None, bidirectional=False, cached=False,
+              guided=False):
+    """
+    Answers every (source, target) pair with `answer_pair`, yielding
+    results in input order.
+
+    Pairs are spread over `workers` processes (all cores by default).
+    Where processes can be forked, workers inherit the data already
+    loaded by this process, including the memory-mapped snapshot pages;
+    otherwise each worker loads `directory` once when it starts. With
+    `cached`, each worker keeps its own `tree_cache`.
+    """
+    answer = functools.partial(
+        answer_pair, bidirectional=bidirectional, cached=cached, guided=guided
+    )
+    if workers == 1:
+        yield from map(answer, pairs)
+        return
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+        initializer, initargs = None, ()
+        # Built before forking so that workers share one copy
+        load_name_index()
+    else:
+        context = multiprocessing.get_context()
+        initializer, initargs = init_worker, (directory, guided)
+    with context.Pool(workers, initializer, initargs) as pool:
+        yield from pool.imap(answer, pairs, chunksize=16)
+
+
+def init_worker(directory, guided):
+    """
+    Loads the data in a batch worker that did not inherit it.
+    """
+    load_data(directory)
+    load_name_index()
+    if guided:
+        load_landmarks(directory)
+
+
+def answer_pair(pair, bidirectional=False, cached=False, guided=False):
+    """
+    Returns a JSON-serialisable result for one (source, target) pair:
+    the resolved person ids, the number of degrees and the path as
+    [movie_id, person_id] lists, or an error message. Names resolve to
+    their best match, so "source_match" and "target_match" give the
+    match score and the number of candidates: anything but a score of
+    1.0 from one candidate may not be the person meant.
+    """
+    source, target = pair
+    result = {"source": source, "target": target}
+    source_match = match_person(source)
+    target_match = match_person(target)
+    if source_match is None or target_match is None:
+        missing = source if source_match is None else target
+        result["error"] = f"Person not found: {missing}"
+        return result
+
+    source_id, *source_quality = source_match
+    target_id, *target_quality = target_match
+    result["source_match"] = dict(zip(["score", "candidates"], source_quality))
+    result["target_match"] = dict(zip(["score", "candidates"], target_quality))
+
+    path = shortest_path(
+        source_id, target_id, bidirectional=bidirectional, cached=cached,
+        guided=guided
+    )
+    result["source_id"] = source_id
+    result["target_id"] = target_id
+    result["degrees"] = None if path is None else len(path)
+    result["path"] = None if path is None else [list(step) for step in path]
+    return result
+
+
+def resolve_person(value, min_score=0.6):
+    """
+    Returns the person id for an IMDB person id or a name, without
+    prompting. A name resolves to its best match (see `match_person`),
+    so people sharing a name resolve to the one with the most movies.
+    Returns None if no name matches with at least `min_score`.
+    """
+    match = match_person(value, min_score)
+    return match[0] if match is not None else None
+
+
+def match_person(value, min_score=0.6):
+    """
+    Returns (person_id, score, candidates) for an IMDB person id or a
+    name, or None, as `NameIndex.match` does. An id is its own exact,
+    unique match.
+    """
+    if value in people:
+        return value, 1.0, 1
+    return load_name_index().match(value, min_score=min_score)
+
+
+def find_people(name, limit=10, min_score=0.3):
+    """
+    Returns up to `limit` (person_id, score) candidates for `name`,
+    best first, from exact, prefix and fuzzy matches (see NameIndex).
+    """
+    return load_name_index().search(name, limit=limit, min_score=min_score)
+
+
+def load_name_index():
+    """
+    Builds the name index of the loaded data, with its trigram index, if
+    it is not built yet, and returns it. Long-running callers build it
+    up front, since it takes seconds on the full dataset.
+    """
+    global name_index
+    if name_index is None:
+        name_index = NameIndex(
+            graph.person_ids,
+            [person["name"] for person in people.values()],
+            weights=[
+                graph.person_offsets[i + 1] - graph.person_offsets[i]
+                for i in range(graph.num_people())
+            ]
+        )
+        name_index.trigram_index()
+    return name_index
+
+
+def shortest_path(source, target, bidirectional=False, cached=False,
+                  guided=False):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
+    If `bidirectional` is true, the search grows from both ends
+    at once (see `bidirectional_path`). If `cached` is true, the
+    path is read from a cached BFS tree instead (see `cached_path`).
+    If `guided` is true and a landmark index is loaded, the landmark
+    bounds are used to skip or prune the search (see `guided_path`).
+
+    People in different connected components are answered with None
+    without searching.
+
     If no possible path, returns None.
     """
-    # this function works based on the BFS search algorithm
-    frontier = QueueFrontier() # initialised a queue frontier
+    if stats is None:
+        return find_path(source, target, bidirectional, cached, guided)
+    start = time.perf_counter()
+    try:
+        return find_path(source, target, bidirectional, cached, guided)
+    finally:
+        stats.search_time += time.perf_counter() - start
+
+
+def find_path(source, target, bidirectional, cached, guided):
+    """
+    Runs the search selected by the options of `shortest_path`.
+    """
+    if not connected(source, target):
+        return None
+    if cached:
+        return cached_path(source, target)
+    if guided and landmark_index is not None:
+        return guided_path(source, target)
+    if bidirectional:
+        return bidirectional_path(source, target)
+    return breadth_first_path(source, target)
+
+
+def breadth_first_path(source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, using a single BFS
+    from the source.
+
+    If no possible path, returns None.
+    """
+    # this function works based on the BFS search algorithm, over the
+    # integer ids of the graph; ids are turned back into IMDB ids at the end
+    source = graph.person_index[source]
+    target = graph.person_index[target]
+    # a plain deque as the queue: `visited` already tells which states were queued
+    frontier = deque()
 
     start = Node(state= source, parent=None, action=None) # node object representing source
-    frontier.add(start)
+    frontier.append(start)
     result = [] 
-    visited = set() # set to store star ids that were already treated
+    visited = bytearray(graph.num_people()) # flags for star ids that were already treated
+    visited[source] = 1
+    expanded = bytearray(graph.num_movies()) # flags for movies whose cast was already listed
+    counting = stats is not None # only track the peak frontier for record_search when collecting
+    peak = 0
 
-    while not frontier.empty(): # while the frontier is not empty
-        current = frontier.remove() # this pops tha first element of the frontier
+    while frontier: # while the frontier is not empty
+        if counting and len(frontier) > peak:
+            peak = len(frontier)
+        current = frontier.popleft() # this pops tha first element of the frontier
         # this code executes if we get to the result, it explores its connections
         if current.state == target:
             
             while current.parent is not None: # if parent is none, then we reached the source
-                result.append((current.action, current.state)) # filling the result array
+                result.append(
+                    (graph.movie_ids[current.action], graph.person_ids[current.state])
+                ) # filling the result array
                 current = current.parent # going back
             result.reverse() # reversing the path to start from the source
+            if counting:
+                nodes = visited.count(1) - len(frontier)
+                record_search(nodes, listed_pairs(expanded), peak)
             return result
 
-        neighbours = neighbors_for_person(current.state)
-        for movie, person in neighbours:
-            if person not in visited and not frontier.contains_state(person):
+        for movie, person in graph.neighbors(current.state, expanded):
+            if not visited[person]:
                 # working with nodes: state = actor id, parent = the one before them, aka the current , action = movie
                 p = Node(state=person, parent=current, action=movie )
-                frontier.add(p)
-                visited.add(person)
+                frontier.append(p)
+                visited[person] = 1
 
+    if counting:
+        record_search(visited.count(1), listed_pairs(expanded), peak)
     return None
 
 
+def bidirectional_path(source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, growing one BFS
+    frontier from each end and joining them where they meet.
+
+    If no possible path, returns None.
+    """
+    if source == target:
+        return []
+    path = meet_in_middle(graph.person_index[source], graph.person_index[target])
+    if path is None:
+        return None
+    return [
+        (graph.movie_ids[movie], graph.person_ids[person])
+        for movie, person in path
+    ]
+
+
+def meet_in_middle(source, target, keep_forward=None, keep_backward=None):
+    """
+    Bidirectional BFS between two distinct integer person ids. Returns
+    the shortest list of integer (movie, person) pairs, or None.
+
+    `keep_forward(person, depth)` and `keep_backward(person, depth)` may
+    be given to drop people reached at `depth` from the source or from
+    the target respectively; they must keep every person on a shortest
+    path, such as a consistent lower bound on the remaining distance.
+    """
+    # Each side maps a reached person to (movie, person) of the person
+    # it was reached from, or None for the side's own root
+    forward = {source: None}
+    backward = {target: None}
+    forward_layer = [source]
+    backward_layer = [target]
+    forward_depth = backward_depth = 0
+    forward_movies = bytearray(graph.num_movies())
+    backward_movies = bytearray(graph.num_movies())
+    nodes = 0
+    peak = 1
+    meeting = None
+
+    while forward_layer and backward_layer:
+        # Always grow the smaller side by one full level
+        if len(forward_layer) <= len(backward_layer):
+            forward_depth += 1
+            nodes += len(forward_layer)
+            forward_layer, meeting = expand_layer(
+                forward_layer, forward, backward, forward_movies,
+                keep_forward, forward_depth
+            )
+        else:
+            backward_depth += 1
+            nodes += len(backward_layer)
+            backward_layer, meeting = expand_layer(
+                backward_layer, backward, forward, backward_movies,
+                keep_backward, backward_depth
+            )
+        peak = max(peak, len(forward_layer) + len(backward_layer))
+        if meeting is not None:
+            break
+
+    if stats is not None:
+        record_search(nodes, listed_pairs(forward_movies, backward_movies), peak)
+    if meeting is None:
+        return None
+    return join_paths(meeting, forward, backward)
+
+
+def expand_layer(layer, parents, others, expanded, keep=None, depth=None):
+    """
+    Expands every person in `layer` by one step, recording new people
+    in `parents` and skipping movies already flagged in `expanded`.
+    If `keep` is given, new people for which `keep(person, depth)` is
+    false are dropped. Returns the next layer and the first person that
+    is also in `others`, or None if the two searches have not met.
+    """
+    next_layer = []
+    for person in layer:
+        for movie, neighbor in graph.neighbors(person, expanded):
+            if neighbor in parents:
+                continue
+            if neighbor in others:
+                parents[neighbor] = (movie, person)
+                return next_layer, neighbor
+            if keep is not None and not keep(neighbor, depth):
+                continue
+            parents[neighbor] = (movie, person)
+            next_layer.append(neighbor)
+    return next_layer, None
+
+
+def join_paths(meeting, forward, backward):
+    """
+    Builds the integer (movie, person) path from the forward root to the
+    backward root through `meeting`.
+    """
+    path = []
+    person = meeting
+    while forward[person] is not None:
+        movie, previous = forward[person]
+        path.append((movie, person))
+        person = previous
+    path.reverse()
+
+    person = meeting
+    while backward[person] is not None:
+        movie, following = backward[person]
+        path.append((movie, following))
+        person = following
+    return path
+
+
+def guided_path(source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs that connect
+    the source to the target, using the bounds of `landmark_index`:
+    pairs it proves disconnected are answered without searching, pairs
+    whose bounds meet are answered by a path through a landmark, and
+    otherwise a bidirectional search drops everyone whose landmark
+    estimate rules them out of any path within the upper bound.
+
+    If no possible path, returns None.
+    """
+    if source == target:
+        return []
+    source = graph.person_index[source]
+    target = graph.person_index[target]
+
+    lower, upper = landmark_index.bounds(source, target)
+    if lower == math.inf:
+        return None
+    if lower == upper:
+        path = landmarks.landmark_path(graph, landmark_index, source, target)
+    elif upper == math.inf:
+        path = meet_in_middle(source, target)
+    else:
+        to_target = landmark_index.heuristic(target, source)
+        to_source = landmark_index.heuristic(source, target)
+        path = meet_in_middle(
+            source, target,
+            keep_forward=lambda person, depth: depth + to_target(person) <= upper,
+            keep_backward=lambda person, depth: depth + to_source(person) <= upper
+        )
+    if path is None:
+        return None
+    return [
+        (graph.movie_ids[movie], graph.person_ids[person])
+        for movie, person in path
+    ]
+
+
+def separation_bounds(source, target):
+    """
+    Returns (lower, upper) bounds on the degrees of separation between
+    two person ids from `landmark_index`, without searching. The upper
+    bound is math.inf when unknown, and both are math.inf when the two
+    people are not connected.
+    """
+    return landmark_index.bounds(
+        graph.person_index[source], graph.person_index[target]
+    )
+
+
+def cached_path(source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs that connect
+    the source to the target, walking the parents of a BFS tree rooted
+    at either end. If neither end has a tree in `tree_cache`, the
+    source's tree is built and cached first, so that later queries from
+    the same source take time proportional to the path length.
+
+    If no possible path, returns None.
+    """
+    source = graph.person_index[source]
+    target = graph.person_index[target]
+
+    reverse = False
+    tree = tree_cache.get(source)
+    if tree is None:
+        tree = tree_cache.get(target)
+        reverse = tree is not None
+    if tree is None:
+        tree = bfs_tree(source)
+        tree_cache.put(source, tree)
+    parents, via = tree
+
+    if reverse:
+        # The tree is rooted at the target, so following parents from
+        # the source already walks the path in order
+        # People added after the tree was built cannot be in it
+        if source >= len(parents) or parents[source] == -1:
+            return None
+        path = []
+        person = source
+        while person != target:
+            path.append((via[person], parents[person]))
+            person = parents[person]
+    else:
+        if target >= len(parents) or parents[target] == -1:
+            return None
+        path = []
+        person = target
+        while person != source:
+            path.append((via[person], person))
+            person = parents[person]
+        path.reverse()
+
+    return [
+        (graph.movie_ids[movie], graph.person_ids[person])
+        for movie, person in path
+    ]
+
+
+def bfs_tree(source):
+    """
+    Runs a full BFS from the integer person id `source`. Returns two
+    arrays indexed by person: the parent each person was reached from
+    (the root is its own parent, and unreached people have -1) and the
+    movie they were reached through.
+    """
+    parents = array("i", [-1]) * graph.num_people()
+    via = array("i", [-1]) * graph.num_people()
+    parents[source] = source
+    expanded = bytearray(graph.num_movies())
+    layer = [source]
+    nodes = peak = 0
+    while layer:
+        nodes += len(layer)
+        peak = max(peak, len(layer))
+        next_layer = []
+        for person in layer:
+            for movie, neighbor in graph.neighbors(person, expanded):
+                if parents[neighbor] == -1:
+                    parents[neighbor] = person
+                    via[neighbor] = movie
+                    next_layer.append(neighbor)
+        layer = next_layer
+    if stats is not None:
+        record_search(nodes, listed_pairs(expanded), peak)
+    return parents, via
+
+
+def shortest_paths(source, target):
+    """
+    Returns the number of distinct shortest paths between two person ids
+    and a generator over those paths, as lists of (movie_id, person_id)
+    pairs. Two paths are distinct if they differ in any person or movie.
+
+    Both come from one layered BFS that stops once the target's layer is
+    complete. Each movie sums the path counts of the stars it is expanded
+    from, and passes the sum on to its stars one layer further out, so
+    counting takes O(V + E) time without building any path. The movies
+    each person was reached through form a predecessor DAG, which the
+    generator walks back from the target only as paths are requested.
+    """
+    if not connected(source, target):
+        return 0, iter(())
+    source = graph.person_index[source]
+    target = graph.person_index[target]
+    if source == target:
+        return 1, iter([[]])
+
+    depths = array("i", [-1]) * graph.num_people()
+    movie_depths = array("i", [-1]) * graph.num_movies()
+    counts = {source: 1}
+    via = {}
+    depths[source] = 0
+    layer = [source]
+    depth = 0
+    nodes = pairs = peak = 0
+    while layer and depths[target] == -1:
+        nodes += len(layer)
+        peak = max(peak, len(layer))
+        movie_counts = {}
+        for person in layer:
+            for movie in graph.movies_of(person):
+                if movie_depths[movie] == -1:
+                    movie_depths[movie] = depth
+                    movie_counts[movie] = 0
+                if movie_depths[movie] == depth:
+                    movie_counts[movie] += counts[person]
+
+        depth += 1
+        next_layer = []
+        for movie, count in movie_counts.items():
+            stars = graph.stars_of(movie)
+            pairs += len(stars)
+            for star in stars:
+                if depths[star] == -1:
+                    depths[star] = depth
+                    counts[star] = 0
+                    via[star] = []
+                    next_layer.append(star)
+                if depths[star] == depth:
+                    counts[star] += count
+                    via[star].append(movie)
+        layer = next_layer
+
+    record_search(nodes, pairs, peak)
+    if depths[target] == -1:
+        return 0, iter(())
+    return counts[target], dag_paths(target, depths, via)
+
+
+def dag_paths(target, depths, via):
+    """
+    Yields every (movie_id, person_id) path from the root of the
+    predecessor DAG built by `shortest_paths` to `target`.
+    """
+    def paths_to(person):
+        if depths[person] == 0:
+            yield []
+            return
+        for movie in via[person]:
+            for star in graph.stars_of(movie):
+                if depths[star] == depths[person] - 1:
+                    for path in paths_to(star):
+                        yield path + [(movie, person)]
+
+    for path in paths_to(target):
+        yield [
+            (graph.movie_ids[movie], graph.person_ids[person])
+            for movie, person in path
+        ]
+
+
+def count_shortest_paths(source, target):
+    """
+    Returns the number of distinct shortest paths between two person ids.
+    """
+    return shortest_paths(source, target)[0]
+
+
+def all_shortest_paths(source, target):
+    """
+    Lazily yields every shortest list of (movie_id, person_id) pairs
+    that connect the source to the target.
+    """
+    return shortest_paths(source, target)[1]
+
+
 def person_id_for_name(name):
     """
     Returns the IMDB id for a person's name,
@@ -152,11 +1044,9 @@ def neighbors_for_person(person_id):
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
-    movie_ids = people[person_id]["movies"]
     neighbors = set()
-    for movie_id in movie_ids:
-        for person_id in movies[movie_id]["stars"]:
-            neighbors.add((movie_id, person_id))
+    for movie, person in graph.neighbors(graph.person_index[person_id]):
+        neighbors.add((graph.movie_ids[movie], graph.person_ids[person]))
     return neighbors
 
 
@@ -0,0 +1,199 @@
+from array import array
+
+
+class Graph():
+    """
+    Person <-> movie bipartite graph in compressed sparse row (CSR) form.
+
+    IMDB ids are interned to dense integers: person `i` is
+    `person_ids[i]` and movie `j` is `movie_ids[j]`. The movies of
+    person `i` are `person_movies[person_offsets[i]:person_offsets[i + 1]]`
+    and the stars of movie `j` are
+    `movie_stars[movie_offsets[j]:movie_offsets[j + 1]]`.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.person_ids = []
+        self.movie_ids = []
+        self.person_index = {}
+        self.movie_index = {}
+        self.person_offsets = array("i", [0])
+        self.person_movies = array("i")
+        self.movie_offsets = array("i", [0])
+        self.movie_stars = array("i")
+
+    def intern(self, person_ids, movie_ids):
+        """
+        Resets the graph to have no edges and assigns dense integer ids
+        to `person_ids` and `movie_ids`, in order.
+        """
+        self.clear()
+        self.person_ids = list(person_ids)
+        self.movie_ids = list(movie_ids)
+        self.person_index = dict(zip(self.person_ids, range(len(self.person_ids))))
+        self.movie_index = dict(zip(self.movie_ids, range(len(self.movie_ids))))
+        self.person_offsets = array("i", bytes(4 * (len(self.person_ids) + 1)))
+        self.movie_offsets = array("i", bytes(4 * (len(self.movie_ids) + 1)))
+
+    def assign(self, person_ids, movie_ids, person_offsets, person_movies,
+               movie_offsets, movie_stars, person_index=None, movie_index=None):
+        """
+        Replaces the graph with already-built CSR arrays, such as views
+        into a memory-mapped snapshot. If `person_index` and `movie_index`
+        are given, they map the ids to their positions, and the ids are
+        used as they are rather than interned again.
+        """
+        if person_index is None or movie_index is None:
+            self.intern(person_ids, movie_ids)
+        else:
+            self.person_ids = person_ids
+            self.movie_ids = movie_ids
+            self.person_index = person_index
+            self.movie_index = movie_index
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_stars = movie_stars
+
+    def connect(self, star_people, star_movies):
+        """
+        Builds the adjacency from parallel arrays of interned ids, where
+        (star_people[k], star_movies[k]) is one starring edge. Duplicate
+        edges are dropped.
+        """
+        self.person_offsets, self.person_movies = csr(
+            len(self.person_ids), star_people, star_movies
+        )
+        self.movie_offsets, self.movie_stars = csr(
+            len(self.movie_ids), star_movies, star_people
+        )
+
+    def append(self, person_ids, movie_ids):
+        """
+        Interns new people and movies after the existing ones, which keep
+        their integer ids. They have no edges until `add_edges` is called.
+        """
+        for person_id in person_ids:
+            self.person_index[person_id] = len(self.person_ids)
+            self.person_ids.append(person_id)
+        for movie_id in movie_ids:
+            self.movie_index[movie_id] = len(self.movie_ids)
+            self.movie_ids.append(movie_id)
+
+    def add_edges(self, star_people, star_movies):
+        """
+        Adds the starring edges (star_people[k], star_movies[k]) between
+        interned ids, also giving rows to people and movies appended
+        since the last rebuild. Only the rows that gain edges are rebuilt;
+        the rest of the CSR arrays are copied as is.
+        """
+        self.person_offsets, self.person_movies = merge(
+            self.person_offsets, self.person_movies, len(self.person_ids),
+            star_people, star_movies
+        )
+        self.movie_offsets, self.movie_stars = merge(
+            self.movie_offsets, self.movie_stars, len(self.movie_ids),
+            star_movies, star_people
+        )
+
+    def num_people(self):
+        return len(self.person_offsets) - 1
+
+    def num_movies(self):
+        return len(self.movie_offsets) - 1
+
+    def movies_of(self, person):
+        """
+        Returns the integer ids of the movies `person` starred in.
+        """
+        return self.person_movies[
+            self.person_offsets[person]:self.person_offsets[person + 1]
+        ]
+
+    def stars_of(self, movie):
+        """
+        Returns the integer ids of the people who starred in `movie`.
+        """
+        return self.movie_stars[
+            self.movie_offsets[movie]:self.movie_offsets[movie + 1]
+        ]
+
+    def neighbors(self, person, expanded=None):
+        """
+        Yields integer (movie, person) pairs for people who starred
+        with `person`, including `person` itself.
+
+        If `expanded` is given, it must be a bytearray with one flag per
+        movie: movies already flagged are skipped, and every movie whose
+        stars are yielded is flagged, so that a search sharing the
+        bytearray enumerates each cast at most once.
+        """
+        for movie in self.movies_of(person):
+            if expanded is not None:
+                if expanded[movie]:
+                    continue
+                expanded[movie] = 1
+            for star in self.stars_of(movie):
+                yield movie, star
+
+    def nbytes(self):
+        """
+        Returns the size in bytes of the adjacency arrays.
+        """
+        return sum(
+            len(a) * a.itemsize for a in (
+                self.person_offsets, self.person_movies,
+                self.movie_offsets, self.movie_stars,
+            )
+        )
+
+
+def csr(n, rows, cols):
+    """
+    Groups the edges (rows[k], cols[k]) by row into CSR offsets and
+    indices, with each row's indices sorted and deduplicated.
+    """
+    counts = array("i", bytes(4 * (n + 1)))
+    for row in rows:
+        counts[row + 1] += 1
+    for i in range(n):
+        counts[i + 1] += counts[i]
+
+    # Scatter each edge into its row using a running cursor per row
+    cursor = array("i", counts)
+    indices = array("i", bytes(4 * len(rows)))
+    for row, col in zip(rows, cols):
+        indices[cursor[row]] = col
+        cursor[row] += 1
+
+    offsets = array("i", [0])
+    compact = array("i")
+    for i in range(n):
+        compact.extend(sorted(set(indices[counts[i]:counts[i + 1]])))
+        offsets.append(len(compact))
+    return offsets, compact
+
+
+def merge(offsets, indices, n, rows, cols):
+    """
+    Returns CSR offsets and indices for `n` rows holding the rows of
+    `offsets` and `indices` plus the edges (rows[k], cols[k]), with each
+    changed row's indices sorted and deduplicated.
+    """
+    added = {}
+    for row, col in zip(rows, cols):
+        added.setdefault(row, set()).add(col)
+
+    merged_offsets = array("i", [0])
+    merged = array("i")
+    for i in range(n):
+        segment = indices[offsets[i]:offsets[i + 1]] if i < len(offsets) - 1 else ()
+        if i in added:
+            merged.extend(sorted(added[i].union(segment)))
+        else:
+            merged.extend(segment)
+        merged_offsets.append(len(merged))
+    return merged_offsets, merged
@@ -0,0 +1,269 @@
+import math
+import os
+import struct
+import sys
+from array import array
+
+import snapshot
+
+# File written next to the CSVs of a data directory
+FILENAME = "degrees.landmarks"
+
+# Bump whenever the layout below changes; older indexes are rebuilt
+VERSION = 1
+
+# The stamp of snapshot.STAMP, number of people and number of
+# landmarks. The header is followed by the landmark person ids (int32),
+# one typecode byte per landmark, and then each landmark's distance array.
+HEADER = struct.Struct(snapshot.STAMP + "qq")
+MAGIC = b"LANDMRK\0"
+
+
+class LandmarkIndex():
+    """
+    Degrees of separation from a few well-connected "landmark" people
+    to everyone else, used to bound the distance between any two people
+    without searching.
+
+    `distances[k][person]` is the number of degrees between landmark
+    `landmarks[k]` and `person`, or the largest value of the array's
+    typecode if they are not connected.
+    """
+
+    def __init__(self, landmarks, distances):
+        self.landmarks = landmarks
+        self.distances = distances
+        self.unreached = [(1 << (8 * d.itemsize)) - 1 for d in distances]
+
+    def __len__(self):
+        return len(self.landmarks)
+
+    def profile(self, person):
+        """
+        Returns the distance from each landmark to `person`, with None
+        for landmarks that cannot reach them.
+        """
+        return [
+            None if d[person] == unreached else d[person]
+            for d, unreached in zip(self.distances, self.unreached)
+        ]
+
+    def bounds(self, a, b):
+        """
+        Returns (lower, upper) bounds on the degrees of separation
+        between integer person ids `a` and `b`, by the triangle
+        inequality through each landmark. The upper bound is math.inf
+        if no landmark reaches both; both bounds are math.inf if some
+        landmark reaches exactly one of them, as they are not connected.
+        """
+        if a == b:
+            return 0, 0
+        lower, upper = 1, math.inf
+        for d, unreached in zip(self.distances, self.unreached):
+            da, db = d[a], d[b]
+            if da == unreached and db == unreached:
+                continue
+            if da == unreached or db == unreached:
+                return math.inf, math.inf
+            lower = max(lower, abs(da - db))
+            upper = min(upper, da + db)
+        return lower, upper
+
+    def heuristic(self, target, source=None, active=4):
+        """
+        Returns a function giving, for any person, a lower bound on their
+        degrees of separation from `target`. The bound is consistent,
+        so it can prune or guide a search.
+
+        If `source` is given, only the `active` landmarks that bound the
+        source-target distance most tightly are consulted, which keeps
+        each estimate cheap during a search between the two.
+        """
+        profile = [
+            (d, d[target])
+            for d, unreached in zip(self.distances, self.unreached)
+            if d[target] != unreached
+        ]
+        if source is not None:
+            profile.sort(key=lambda entry: abs(entry[0][source] - entry[1]))
+            profile = profile[-active:]
+
+        def estimate(person):
+            return max((abs(d[person] - dt) for d, dt in profile), default=0)
+        return estimate
+
+    def save(self, directory):
+        """
+        Writes the index next to the CSV files of `directory`, tagged
+        with their current mtime and size. Returns False if it could not
+        be written.
+        """
+        header = snapshot.stamp(
+            HEADER, MAGIC, VERSION, directory,
+            len(self.distances[0]) if self.distances else 0,
+            len(self.landmarks)
+        )
+        return snapshot.write_file(os.path.join(directory, FILENAME), [
+            header,
+            array("i", self.landmarks),
+            "".join(typecode(d) for d in self.distances).encode(),
+            *self.distances,
+        ])
+
+    @classmethod
+    def load(cls, directory):
+        """
+        Memory-maps the index saved for `directory`. Returns None if it
+        is missing, or was built by another version or for CSV files
+        that have since changed.
+        """
+        mapped = snapshot.map_file(
+            os.path.join(directory, FILENAME), HEADER, MAGIC, VERSION, directory
+        )
+        if mapped is None:
+            return None
+        data, (n, count) = mapped
+
+        view = memoryview(data)
+        offset = HEADER.size
+        landmarks = list(view[offset:offset + 4 * count].cast("i"))
+        offset += 4 * count
+        typecodes = bytes(view[offset:offset + count]).decode()
+        offset += count
+        distances = []
+        for typecode in typecodes:
+            size = n * array(typecode).itemsize
+            if offset + size > len(data):
+                return None
+            distances.append(view[offset:offset + size].cast(typecode))
+            offset += size
+        return cls(landmarks, distances)
+
+    @classmethod
+    def build(cls, graph, count=16):
+        """
+        Builds an index over `graph` with up to `count` landmarks. People
+        are tried in decreasing order of their number of movies, and one
+        is taken as a landmark only if they are at least two degrees away
+        from every landmark taken so far, so landmarks spread out over
+        the graph rather than clustering in one cast.
+        """
+        n = graph.num_people()
+        candidates = sorted(
+            range(n),
+            key=lambda p: graph.person_offsets[p + 1] - graph.person_offsets[p],
+            reverse=True
+        )
+        landmarks = []
+        distances = []
+        for person in candidates:
+            if len(landmarks) == count:
+                break
+            if any(d[person] < 2 for d in distances):
+                continue
+            landmarks.append(person)
+            distances.append(bfs_distances(graph, person))
+        return cls(landmarks, [compact(d) for d in distances])
+
+
+def typecode(distances):
+    """
+    Returns the array typecode of a distance array or memoryview.
+    """
+    return distances.typecode if isinstance(distances, array) else distances.format
+
+
+def bfs_distances(graph, source):
+    """
+    Returns an array('H') of degrees of separation from `source` to every
+    person, with 65535 for people it cannot reach.
+    """
+    distances = array("H", [65535]) * graph.num_people()
+    distances[source] = 0
+    expanded = bytearray(graph.num_movies())
+    layer = [source]
+    depth = 0
+    while layer:
+        depth += 1
+        next_layer = []
+        for person in layer:
+            for _, neighbor in graph.neighbors(person, expanded):
+                if distances[neighbor] == 65535:
+                    distances[neighbor] = depth
+                    next_layer.append(neighbor)
+        layer = next_layer
+    return distances
+
+
+def compact(distances):
+    """
+    Narrows an array('H') from `bfs_distances` to one byte per person
+    when every finite distance fits.
+    """
+    if max((d for d in distances if d != 65535), default=0) >= 255:
+        return distances
+    return array("B", bytes(255 if d == 65535 else d for d in distances))
+
+
+def landmark_path(graph, index, source, target):
+    """
+    Returns a list of integer (movie, person) pairs from `source` to
+    `target` that runs through the landmark giving the tightest upper
+    bound, found by stepping down each side's landmark distances. The
+    path is a shortest one whenever the index's bounds are equal.
+    Returns None if no landmark reaches both people.
+    """
+    best = None
+    for k, (d, unreached) in enumerate(zip(index.distances, index.unreached)):
+        if d[source] == unreached or d[target] == unreached:
+            continue
+        if best is None or d[source] + d[target] < best[0]:
+            best = (d[source] + d[target], k)
+    if best is None:
+        return None
+    distances = index.distances[best[1]]
+
+    to_landmark = descend(graph, distances, source)
+    from_landmark = []
+    person = target
+    for movie, next_person in descend(graph, distances, target):
+        from_landmark.append((movie, person))
+        person = next_person
+    from_landmark.reverse()
+    return to_landmark + from_landmark
+
+
+def descend(graph, distances, person):
+    """
+    Returns (movie, person) steps from `person` to the landmark whose
+    `distances` are given, moving one degree closer at every step.
+    """
+    steps = []
+    while distances[person] > 0:
+        closer = distances[person] - 1
+        for movie, neighbor in graph.neighbors(person):
+            if distances[neighbor] == closer:
+                steps.append((movie, neighbor))
+                person = neighbor
+                break
+    return steps
+
+
+def main():
+    if len(sys.argv) not in (2, 3):
+        sys.exit("Usage: python landmarks.py directory [count]")
+    directory = sys.argv[1]
+    count = int(sys.argv[2]) if len(sys.argv) == 3 else 16
+
+    import degrees
+    print("Loading data...")
+    degrees.load_data(directory)
+    print("Building landmark index...")
+    index = LandmarkIndex.build(degrees.graph, count)
+    if not index.save(directory):
+        sys.exit("Could not write the landmark index.")
+    print(f"Saved {len(index)} landmarks to {os.path.join(directory, FILENAME)}.")
+
+
+if __name__ == "__main__":
+    main()
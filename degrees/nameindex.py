@@ -0,0 +1,186 @@
+import heapq
+import unicodedata
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+
+
+class NameIndex():
+    """
+    Ranked name lookups over a fixed list of people.
+
+    Normalized names are kept in one sorted list, so exact and prefix
+    matches are found by binary search. Fuzzy matches are found through
+    an index from character trigrams to the positions of the names that
+    contain them, built the first time it is needed. Neither kind of
+    lookup scans every name.
+    """
+
+    def __init__(self, person_ids, person_names, weights=None):
+        """
+        `weights`, if given, ranks people with equally good matches,
+        for example by their number of movies.
+        """
+        keys = [normalize(name) for name in person_names]
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.keys = [keys[i] for i in order]
+        self.ids = [person_ids[i] for i in order]
+        self.weights = [weights[i] if weights is not None else 0 for i in order]
+        self.grams = None
+        self.sizes = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def exact(self, name):
+        """
+        Returns the ids of the people whose name is `name`, ignoring
+        case, accents and repeated spaces.
+        """
+        start, end = self.exact_range(normalize(name))
+        return self.ids[start:end]
+
+    def prefix(self, text, limit=10):
+        """
+        Returns up to `limit` ids of people whose name starts with `text`,
+        highest weight first.
+        """
+        start, end = self.prefix_range(normalize(text))
+        best = heapq.nlargest(limit, range(start, end), key=self.weights.__getitem__)
+        return [self.ids[i] for i in best]
+
+    def search(self, name, limit=10, min_score=0.3):
+        """
+        Returns up to `limit` (person_id, score) pairs for the people
+        whose names best match `name`, best first. Exact matches score
+        1, names starting with `name` score the fraction of the name it
+        covers, and any other name scores the Dice similarity of its
+        trigrams with those of `name`. Equal scores are ranked by weight.
+        Matches scoring below `min_score` are left out.
+
+        If at least `limit` names match exactly, nothing can rank above
+        them, so no other name is scored.
+        """
+        key = normalize(name)
+        if not key:
+            return []
+        start, end = self.exact_range(key)
+        if end - start >= limit:
+            best = heapq.nlargest(limit, range(start, end), key=self.weights.__getitem__)
+            return [(self.ids[i], 1.0) for i in best]
+
+        scores = self.scores(key)
+        best = heapq.nlargest(
+            limit,
+            (i for i, score in scores.items() if score >= min_score),
+            key=lambda i: (scores[i], self.weights[i])
+        )
+        return [(self.ids[i], scores[i]) for i in best]
+
+    def resolve(self, name, min_score=0.6):
+        """
+        Returns the id of the best match for `name` without asking,
+        or None if no name scores at least `min_score`.
+        """
+        match = self.match(name, min_score)
+        return match[0] if match is not None else None
+
+    def match(self, name, min_score=0.6):
+        """
+        Returns (person_id, score, candidates) for the best match for
+        `name`, where `candidates` is the number of names scoring at
+        least `min_score`, so that callers can tell an ambiguous or fuzzy
+        match from a unique exact one. Returns None if there is no match.
+
+        Exact matches are taken without scoring any other name, and
+        `candidates` is then the number of people with that exact name.
+        """
+        key = normalize(name)
+        if not key:
+            return None
+        start, end = self.exact_range(key)
+        if end > start:
+            best = max(range(start, end), key=self.weights.__getitem__)
+            return self.ids[best], 1.0, end - start
+
+        scores = self.scores(key)
+        found = [i for i, score in scores.items() if score >= min_score]
+        if not found:
+            return None
+        best = max(found, key=lambda i: (scores[i], self.weights[i]))
+        return self.ids[best], scores[best], len(found)
+
+    def scores(self, key):
+        """
+        Returns the prefix or trigram score of every name matching the
+        normalized `key`, by position.
+        """
+        scores = {}
+
+        start, end = self.prefix_range(key)
+        for i in range(start, end):
+            scores[i] = len(key) / len(self.keys[i])
+
+        query = trigrams(key)
+        grams, sizes = self.trigram_index()
+        common = Counter()
+        for gram in query:
+            if gram in grams:
+                common.update(grams[gram])
+        for i, count in common.items():
+            score = 2 * count / (len(query) + sizes[i])
+            if score > scores.get(i, 0):
+                scores[i] = score
+        return scores
+
+    def exact_range(self, key):
+        """
+        Returns the [start, end) positions of the names equal to `key`.
+        """
+        start = bisect_left(self.keys, key)
+        return start, bisect_right(self.keys, key, start)
+
+    def prefix_range(self, key):
+        """
+        Returns the [start, end) positions of the names starting with `key`.
+        """
+        start = bisect_left(self.keys, key)
+        end = bisect_left(self.keys, key + "\U0010ffff", start)
+        return start, end
+
+    def trigram_index(self):
+        """
+        Returns the trigram -> positions index and the number of
+        trigrams of each name, building them on first use.
+        """
+        if self.grams is None:
+            grams = {}
+            sizes = array("H")
+            for i, key in enumerate(self.keys):
+                found = trigrams(key)
+                sizes.append(len(found))
+                for gram in found:
+                    if gram in grams:
+                        grams[gram].append(i)
+                    else:
+                        grams[gram] = array("i", [i])
+            self.grams, self.sizes = grams, sizes
+        return self.grams, self.sizes
+
+
+def normalize(name):
+    """
+    Lowercases `name`, strips accents and collapses whitespace.
+    """
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())
+
+
+def trigrams(key):
+    """
+    Returns the set of three-character substrings of `key`, padded so
+    that the start and end of the name count as well.
+    """
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
@@ -0,0 +1,42 @@
+class SearchStats():
+    """
+    Counters accumulated by degrees while collecting is enabled (see
+    `degrees.enable_stats`).
+
+    - searches: number of searches run
+    - expanded: people whose neighbors were listed
+    - pairs: (movie, person) neighbor pairs in the casts listed
+    - peak_frontier: largest frontier or BFS layer seen
+    - load_time, search_time: wall time in seconds spent loading data
+      and answering `shortest_path` calls
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.searches = 0
+        self.expanded = 0
+        self.pairs = 0
+        self.peak_frontier = 0
+        self.load_time = 0.0
+        self.search_time = 0.0
+
+    def record(self, expanded, pairs, frontier):
+        """
+        Adds the counts of one search.
+        """
+        self.searches += 1
+        self.expanded += expanded
+        self.pairs += pairs
+        self.peak_frontier = max(self.peak_frontier, frontier)
+
+    def as_dict(self):
+        return {
+            "searches": self.searches,
+            "expanded": self.expanded,
+            "pairs": self.pairs,
+            "peak_frontier": self.peak_frontier,
+            "load_time": self.load_time,
+            "search_time": self.search_time,
+        }
@@ -0,0 +1,166 @@
+import argparse
+import asyncio
+import functools
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import degrees
+from client import SOCKET
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve degrees queries over a local socket, "
+                    "one JSON request and response per line."
+    )
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument(
+        "--socket", default=SOCKET,
+        help=f"Unix socket to listen on (default: {SOCKET})"
+    )
+    parser.add_argument(
+        "--port", type=int, default=None,
+        help="listen on this localhost TCP port instead of a Unix socket"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="worker processes for searches (default: all cores, "
+             "0 to search in a thread of the server process)"
+    )
+    parser.add_argument(
+        "--guided", action="store_true",
+        help="load a landmark index so clients can request guided searches"
+    )
+    args = parser.parse_args()
+
+    print("Loading data...", file=sys.stderr)
+    degrees.load_data(args.directory)
+    degrees.load_name_index()
+    if args.guided:
+        degrees.load_landmarks(args.directory)
+    print("Data loaded.", file=sys.stderr)
+
+    try:
+        asyncio.run(serve(
+            args.directory, path=args.socket, port=args.port,
+            workers=args.workers, guided=args.guided
+        ))
+    except KeyboardInterrupt:
+        pass
+
+
+async def serve(directory, path=SOCKET, port=None, workers=None, guided=False):
+    """
+    Answers requests until cancelled, on the Unix socket `path` or, if
+    `port` is given, on that localhost TCP port. Data must already be
+    loaded by `degrees.load_data`, and the name index should be built by
+    `degrees.load_name_index` so that workers share it.
+
+    Searches and name lookups run in a pool of `workers` processes so
+    the event loop stays responsive. Where processes can be forked,
+    workers share the data already loaded here; otherwise each loads
+    `directory` when it starts.
+    """
+    pool = None
+    if workers != 0:
+        if "fork" in multiprocessing.get_all_start_methods():
+            pool = ProcessPoolExecutor(
+                workers, mp_context=multiprocessing.get_context("fork")
+            )
+        else:
+            pool = ProcessPoolExecutor(
+                workers, initializer=degrees.init_worker,
+                initargs=(directory, guided)
+            )
+
+    handler = functools.partial(handle, pool=pool)
+    if port is not None:
+        server = await asyncio.start_server(handler, "127.0.0.1", port)
+        print(f"Listening on 127.0.0.1:{port}", file=sys.stderr)
+    else:
+        if os.path.exists(path):
+            os.remove(path)
+        server = await asyncio.start_unix_server(handler, path)
+        print(f"Listening on {path}", file=sys.stderr)
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        if port is None and os.path.exists(path):
+            os.remove(path)
+
+
+async def handle(reader, writer, pool=None):
+    """
+    Answers each JSON line read from one connection, in order.
+    """
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                response = await respond(json.loads(line), pool)
+            except (ValueError, KeyError, TypeError) as e:
+                response = {"error": f"Bad request: {e}"}
+            writer.write((json.dumps(response) + "\n").encode("utf-8"))
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def respond(request, pool):
+    """
+    Returns the response to one request, a dictionary with an "op" of:
+
+    - "path": find the shortest path between "source" and "target",
+      each a person id or a name (see `degrees.resolve_person`), with
+      optional boolean "bidirectional", "cached" and "guided" search
+      options; the response is the result of `degrees.answer_pair`
+    - "lookup": list up to "limit" (default 10) people whose names best
+      match "name", with their match scores
+    - "ping": check that the server is up
+    """
+    op = request["op"]
+    if op == "ping":
+        return {"ok": True}
+    loop = asyncio.get_running_loop()
+    if op == "lookup":
+        find = functools.partial(
+            lookup, str(request["name"]), int(request.get("limit", 10))
+        )
+        matches = await loop.run_in_executor(pool, find)
+        return {"name": request["name"], "matches": matches}
+    if op == "path":
+        answer = functools.partial(
+            degrees.answer_pair,
+            (str(request["source"]), str(request["target"])),
+            bidirectional=bool(request.get("bidirectional", False)),
+            cached=bool(request.get("cached", False)),
+            guided=bool(request.get("guided", False))
+        )
+        return await loop.run_in_executor(pool, answer)
+    return {"error": f"Unknown op: {op}"}
+
+
+def lookup(name, limit=10):
+    """
+    Returns the id, name, birth and match score of the people whose
+    names best match `name`.
+    """
+    return [
+        {"id": person_id, **degrees.people[person_id], "score": score}
+        for person_id, score in degrees.find_people(name, limit)
+    ]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,404 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import MutableMapping, Sequence
+
+# File written next to the CSVs of a data directory
+FILENAME = "degrees.snapshot"
+
+# Bump whenever the layout below changes; older snapshots are rebuilt
+VERSION = 2
+
+CSV_FILES = ("people.csv", "movies.csv", "stars.csv")
+
+# Magic, version, byte order marker and (mtime_ns, size) of each CSV
+# file: the start of the header of every file written next to the CSVs
+STAMP = "<8sII6q"
+
+# The stamp, lengths of the four adjacency arrays, byte lengths of the
+# six string tables. The header is followed by the int64 offsets of the
+# strings in each table, the int32 adjacency arrays, the int32 orders
+# of people by id, movies by id and people by lowercased name, and the
+# string tables.
+HEADER = struct.Struct(STAMP + "4q6q")
+MAGIC = b"DEGREES\0"
+BYTE_ORDER = 1 if sys.byteorder == "little" else 2
+
+
+def path_for(directory):
+    return os.path.join(directory, FILENAME)
+
+
+def csv_stats(directory):
+    """
+    Returns the (mtime_ns, size) of each CSV file in `directory`,
+    flattened into one tuple.
+    """
+    stats = []
+    for filename in CSV_FILES:
+        info = os.stat(os.path.join(directory, filename))
+        stats.extend((info.st_mtime_ns, info.st_size))
+    return tuple(stats)
+
+
+def write(directory, people, movies, graph):
+    """
+    Writes `people`, `movies` and the CSR arrays of `graph` to the
+    snapshot file of `directory`. The graph must have been interned
+    in the order of `people` and `movies`.
+
+    Returns False if the snapshot could not be written.
+    """
+    arrays = (
+        graph.person_offsets, graph.person_movies,
+        graph.movie_offsets, graph.movie_stars,
+    )
+    person_ids = list(graph.person_ids)
+    movie_ids = list(graph.movie_ids)
+    person_names = [person["name"] for person in people.values()]
+    tables = [
+        pack_strings(person_ids),
+        pack_strings(person_names),
+        pack_strings(person["birth"] for person in people.values()),
+        pack_strings(movie_ids),
+        pack_strings(movie["title"] for movie in movies.values()),
+        pack_strings(movie["year"] for movie in movies.values()),
+    ]
+    orders = [
+        sort_order(person_ids),
+        sort_order(movie_ids),
+        sort_order([name.lower() for name in person_names]),
+    ]
+    header = stamp(
+        HEADER, MAGIC, VERSION, directory,
+        *(len(a) for a in arrays),
+        *(len(table) for _, table in tables)
+    )
+    return write_file(path_for(directory), [
+        header,
+        *(offsets for offsets, _ in tables),
+        *arrays,
+        *orders,
+        *(table for _, table in tables),
+    ])
+
+
+def read(directory):
+    """
+    Memory-maps the snapshot file of `directory`.
+
+    Returns None if there is no snapshot, or if it was written by another
+    version or for CSV files whose mtime or size have since changed.
+    Otherwise returns the four CSR arrays, as int32 views into the mapped
+    file, the person ids, names and births and the movie ids, titles and
+    years as `StringTable`s, and the orders of people by id, movies by
+    id and people by lowercased name, as int32 views. Nothing is decoded
+    until it is looked up.
+    """
+    mapped = map_file(path_for(directory), HEADER, MAGIC, VERSION, directory)
+    if mapped is None:
+        return None
+    data, fields = mapped
+    lengths = fields[:4]
+    sizes = fields[4:]
+    counts = [lengths[0] - 1] * 3 + [lengths[2] - 1] * 3
+    order_lengths = [counts[0], counts[3], counts[0]]
+    size = (
+        HEADER.size + 8 * sum(count + 1 for count in counts)
+        + 4 * sum(lengths) + 4 * sum(order_lengths) + sum(sizes)
+    )
+    if min(counts) < 0 or size != len(data):
+        return None
+
+    view = memoryview(data)
+    offset = HEADER.size
+    string_offsets = []
+    for count in counts:
+        string_offsets.append(view[offset:offset + 8 * (count + 1)].cast("q"))
+        offset += 8 * (count + 1)
+    arrays = []
+    for length in (*lengths, *order_lengths):
+        arrays.append(view[offset:offset + 4 * length].cast("i"))
+        offset += 4 * length
+
+    tables = []
+    for size, offsets in zip(sizes, string_offsets):
+        tables.append(StringTable(data, offset, offsets))
+        offset += size
+    return arrays[:4], tables, arrays[4:]
+
+
+def stamp(header, magic, version, directory, *fields):
+    """
+    Packs `header`, a struct starting with `STAMP`, with `magic`,
+    `version`, the byte order and the current mtime and size of each
+    CSV file of `directory`, followed by `fields`.
+    """
+    return header.pack(
+        magic, version, BYTE_ORDER, *csv_stats(directory), *fields
+    )
+
+
+def write_file(path, chunks):
+    """
+    Writes the bytes-like `chunks` to `path`, through a temporary file
+    so readers never see a partial file. Returns False if the file could
+    not be written.
+    """
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(temporary, path)
+    except OSError:
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+        return False
+    return True
+
+
+def map_file(path, header, magic, version, directory):
+    """
+    Memory-maps the file at `path`, which starts with a `header` packed
+    by `stamp`. Returns the mapped data and the header fields after the
+    stamp, or None if the file is missing, or was written by another
+    version or for CSV files of `directory` that have since changed.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        stats = csv_stats(directory)
+    except (OSError, ValueError):
+        return None
+    if len(data) < header.size:
+        return None
+
+    fields = header.unpack_from(data)
+    if fields[:3] != (magic, version, BYTE_ORDER) or fields[3:9] != stats:
+        return None
+    return data, fields[9:]
+
+
+def pack_strings(strings):
+    """
+    Encodes `strings` as one UTF-8 table, returning the int64 offset of
+    each string in it, followed by the table's length, and the table.
+    """
+    offsets = array("q", [0])
+    encoded = []
+    for string in strings:
+        encoded.append(string.encode("utf-8"))
+        offsets.append(offsets[-1] + len(encoded[-1]))
+    return offsets, b"".join(encoded)
+
+
+def sort_order(keys):
+    """
+    Returns an array('i') of the positions of `keys` in sorted order.
+    """
+    return array("i", sorted(range(len(keys)), key=keys.__getitem__))
+
+
+class StringTable(Sequence):
+    """
+    A list of strings held in a table written by `pack_strings`, decoded
+    one at a time as they are looked up. Strings appended later are kept
+    in an ordinary list after them.
+    """
+
+    def __init__(self, data, start, offsets):
+        self.data = data
+        self.start = start
+        self.offsets = offsets
+        self.mapped = len(offsets) - 1
+        self.appended = []
+
+    def __len__(self):
+        return self.mapped + len(self.appended)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("string table index out of range")
+        if i >= self.mapped:
+            return self.appended[i - self.mapped]
+        start = self.start + self.offsets[i]
+        return self.data[start:self.start + self.offsets[i + 1]].decode("utf-8")
+
+    def append(self, string):
+        self.appended.append(string)
+
+
+class SortedView(Sequence):
+    """
+    The strings of a `StringTable` in the order given by `order`, passed
+    through `key` if given, for binary search with `bisect`.
+    """
+
+    def __init__(self, table, order, key=None):
+        self.table = table
+        self.order = order
+        self.key = key
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, i):
+        string = self.table[self.order[i]]
+        return string if self.key is None else self.key(string)
+
+    def range(self, value):
+        """
+        Returns the [start, end) positions of the strings equal to `value`.
+        """
+        start = bisect_left(self, value)
+        return start, bisect_right(self, value, start)
+
+
+class TableIndex(MutableMapping):
+    """
+    A dictionary from each string of a `StringTable` to its position,
+    found by binary search over `order`, the positions of the strings in
+    sorted order. Strings must be unique, and strings set later must be
+    new; they are kept in an ordinary dictionary over the table.
+    """
+
+    def __init__(self, table, order):
+        self.table = table
+        self.sorted = SortedView(table, order)
+        self.added = {}
+
+    def __getitem__(self, string):
+        if string in self.added:
+            return self.added[string]
+        start, end = self.sorted.range(string)
+        if start == end:
+            raise KeyError(string)
+        return self.sorted.order[start]
+
+    def __setitem__(self, string, position):
+        self.added[string] = position
+
+    def __delitem__(self, string):
+        raise TypeError("entries cannot be removed from a TableIndex")
+
+    def __iter__(self):
+        for i in range(self.table.mapped):
+            yield self.table[i]
+        yield from self.added
+
+    def __len__(self):
+        return self.table.mapped + len(self.added)
+
+
+class MappedRecords(MutableMapping):
+    """
+    A dictionary from id to a record dictionary, such as `degrees.people`,
+    whose records are decoded from string tables when looked up. `index`
+    maps an id to its position in `ids` and in the table of each field
+    in `fields`, a dictionary from field name to table. Records set later
+    are kept in an ordinary dictionary over the tables; ids new to
+    `ids` go after the others, in the order they were set.
+    """
+
+    def __init__(self, ids, index, fields):
+        self.ids = ids
+        self.index = index
+        self.fields = fields
+        self.updated = {}
+
+    def __getitem__(self, key):
+        if key in self.updated:
+            return self.updated[key]
+        position = self.index[key]
+        return {field: table[position] for field, table in self.fields.items()}
+
+    def __contains__(self, key):
+        return key in self.updated or key in self.index
+
+    def __setitem__(self, key, record):
+        self.updated[key] = record
+
+    def __delitem__(self, key):
+        raise TypeError("records cannot be removed from a MappedRecords")
+
+    def __iter__(self):
+        for i in range(self.ids.mapped):
+            yield self.ids[i]
+        yield from self.added()
+
+    def __len__(self):
+        return self.ids.mapped + sum(1 for _ in self.added())
+
+    def added(self):
+        """
+        Yields the ids set later that have no row in the tables.
+        """
+        for key in self.updated:
+            position = self.index.get(key)
+            if position is None or position >= self.ids.mapped:
+                yield key
+
+    def values(self):
+        """
+        Yields every record in order, decoding them by position rather
+        than looking each id up.
+        """
+        for i in range(self.ids.mapped):
+            record = self.updated.get(self.ids[i])
+            if record is None:
+                record = {field: table[i] for field, table in self.fields.items()}
+            yield record
+        for key in self.added():
+            yield self.updated[key]
+
+
+class MappedNames(MutableMapping):
+    """
+    A dictionary from lowercased name to the set of ids of the people
+    with that name, such as `degrees.names`, found by binary search over
+    `order`, the positions of `person_names` in lowercased order. A set
+    is decoded the first time its name is looked up, and kept, so that
+    changes to it last.
+    """
+
+    def __init__(self, person_ids, person_names, order):
+        self.person_ids = person_ids
+        self.sorted = SortedView(person_names, order, key=str.lower)
+        self.sets = {}
+
+    def __getitem__(self, name):
+        if name not in self.sets:
+            start, end = self.sorted.range(name)
+            if start == end:
+                raise KeyError(name)
+            self.sets[name] = {
+                self.person_ids[self.sorted.order[i]] for i in range(start, end)
+            }
+        return self.sets[name]
+
+    def __setitem__(self, name, person_ids):
+        self.sets[name] = person_ids
+
+    def __delitem__(self, name):
+        raise TypeError("names cannot be removed from a MappedNames")
+
+    def __iter__(self):
+        previous = None
+        for name in self.sorted:
+            if name != previous and name not in self.sets:
+                yield name
+            previous = name
+        yield from self.sets
+
+    def __len__(self):
+        return sum(1 for _ in self)
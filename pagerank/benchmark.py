@@ -0,0 +1,339 @@
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import crawler
+import outofcore
+import pagerank
+import partitioned
+import sampling
+import solvers
+import topk
+from sparse import LinkGraph, power_iteration
+
+# Pages above which the dictionary-based stages of pagerank.py are skipped,
+# as their iteration takes time quadratic in the number of pages
+LEGACY_PAGES = 2000
+
+# Rounds of redrawing repeated links before a page is left short of links
+REDRAWS = 32
+
+# Ranking stages the benchmark can run
+STAGES = [
+    "iterate", "partitioned", "gauss-seidel", "quadratic", "stream", "topk",
+    "sample", "parallel-sample", "legacy-iterate", "legacy-sample",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic web graphs and benchmark PageRank."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = commands.add_parser(
+        "generate", help="write a synthetic corpus of HTML pages or a graph file"
+    )
+    generate_parser.add_argument("path")
+    generate_parser.add_argument("--pages", type=int, default=10000)
+    generate_parser.add_argument(
+        "--format", choices=["html", "graph"], default="html",
+        help="a directory of HTML pages, or a graph file readable by outofcore.py"
+    )
+    generate_parser.add_argument(
+        "--links", type=float, default=8.0, help="mean links per linking page"
+    )
+    generate_parser.add_argument(
+        "--alpha", type=float, default=2.1,
+        help="power-law exponent of the in- and out-degrees (above 2)"
+    )
+    generate_parser.add_argument(
+        "--dangling", type=float, default=0.1, help="fraction of pages without links"
+    )
+    generate_parser.add_argument(
+        "--components", type=int, default=1,
+        help="number of groups of pages with no links between them"
+    )
+    generate_parser.add_argument("--seed", type=int, default=0)
+
+    run_parser = commands.add_parser(
+        "run", help="time each stage against an exact solution"
+    )
+    run_parser.add_argument("path", help="an HTML corpus directory or a graph file")
+    run_parser.add_argument(
+        "--stages", default="iterate,gauss-seidel,quadratic,stream,topk,sample",
+        help=f"comma-separated ranking stages from: {', '.join(STAGES)}"
+    )
+    run_parser.add_argument("--samples", type=int, default=pagerank.SAMPLES * 100)
+    run_parser.add_argument("-k", type=int, default=100)
+    run_parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        indptr, indices = generate(
+            args.pages, args.links, args.alpha, args.dangling,
+            args.components, args.seed
+        )
+        if args.format == "html":
+            write_html(args.path, indptr, indices)
+        else:
+            write_graph_file(args.path, indptr, indices)
+        outdegree = np.diff(indptr)
+        linking = np.count_nonzero(outdegree)
+        print(f"Wrote {args.pages} pages and {len(indices)} links: "
+              f"{1 - linking / args.pages:.1%} of pages without links, "
+              f"{len(indices) / max(1, linking):.2f} links per linking page.")
+    else:
+        stages = args.stages.split(",")
+        for stage in stages:
+            if stage not in STAGES:
+                sys.exit(f"Unknown stage: {stage}")
+        report = run(args.path, stages, args.samples, args.k, args.seed)
+        print(json.dumps(report, indent=2))
+
+
+def generate(pages, links=8.0, alpha=2.1, dangling=0.1, components=1, seed=0):
+    """
+    Returns the link offsets and links, in the CSR form of `LinkGraph`,
+    of a synthetic web graph of `pages` pages, reproducibly for `seed`.
+
+    A `dangling` fraction of pages have no links. The others have at
+    least one link, with a number of links drawn from a power law with
+    exponent `alpha` and scaled so that the mean is `links`. Each link
+    points to a page drawn in proportion to power-law weights with the
+    same exponent, so a few pages collect most links. Pages are split
+    into `components` groups of random sizes, with links only within a
+    group. Repeated links and links from a page to itself are drawn
+    again, evenly over the group, so that pages keep their number of
+    links unless their group is too small; drawing them by weight would
+    keep hitting the same few pages for pages with very many links.
+    """
+    if alpha <= 2:
+        raise ValueError("alpha must be above 2 for the mean degree to be finite")
+    rng = np.random.default_rng(seed)
+    outdegree = power_law_degrees(rng.pareto(alpha - 1, pages) + 1, links)
+    outdegree[rng.random(pages) < dangling] = 0
+    weights = rng.pareto(alpha - 1, pages) + 1
+
+    cuts = rng.choice(np.arange(1, pages), min(components, pages) - 1, replace=False)
+    bounds = [0, *np.sort(cuts).tolist(), pages]
+    keys = []
+    for start, end in zip(bounds, bounds[1:]):
+        wanted = np.minimum(outdegree[start:end], end - start - 1)
+        cumulative = np.cumsum(weights[start:end])
+        group = np.zeros(0, dtype=np.int64)
+        for redraw in range(REDRAWS):
+            have = np.bincount(group // pages - start, minlength=end - start)
+            missing = wanted - have
+            if not missing.any():
+                break
+            # Only the links of pages that are short are deduplicated again
+            short = (missing > 0)[group // pages - start]
+            sources = np.repeat(np.arange(start, end, dtype=np.int64), missing)
+            if redraw:
+                targets = rng.integers(start, end, size=len(sources))
+            else:
+                draws = rng.random(len(sources)) * cumulative[-1]
+                targets = start + np.searchsorted(cumulative, draws, side="right")
+                targets = np.minimum(targets, end - 1)
+            drawn = (sources * pages + targets)[sources != targets]
+            redrawn = distinct(np.concatenate([group[short], drawn]))
+            group = np.concatenate([group[~short], redrawn])
+        keys.append(group)
+    keys = np.sort(np.concatenate(keys))
+    sources, targets = np.divmod(keys, pages)
+
+    indptr = np.zeros(pages + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=pages), out=indptr[1:])
+    return indptr, targets.astype(np.int32)
+
+
+def distinct(keys):
+    """
+    Returns the distinct values of the integer array `keys`, sorted. A
+    sort is faster than `np.unique` on arrays of this size.
+    """
+    keys = np.sort(keys)
+    if not len(keys):
+        return keys
+    return keys[np.concatenate([[True], keys[1:] != keys[:-1]])]
+
+
+def power_law_degrees(samples, mean):
+    """
+    Returns `samples` scaled and rounded down to whole numbers of at
+    least 1, with the scale found by bisection so that their mean is as
+    close to `mean` as possible.
+    """
+    low, high = 0.0, float(mean)
+    for _ in range(50):
+        scale = (low + high) / 2
+        if np.maximum(1, np.floor(scale * samples)).mean() < mean:
+            low = scale
+        else:
+            high = scale
+    return np.maximum(1, np.floor(high * samples)).astype(np.int64)
+
+
+def page_name(i):
+    return f"{i}.html"
+
+
+def write_html(directory, indptr, indices):
+    """
+    Writes one HTML page per page of the graph to `directory`, named by
+    its number, with an anchor for each of its links.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for i in range(len(indptr) - 1):
+        anchors = "".join(
+            f'<li><a href="{page_name(j)}">Page {j}</a></li>\n'
+            for j in indices[indptr[i]:indptr[i + 1]].tolist()
+        )
+        with open(os.path.join(directory, page_name(i)), "w", encoding="utf-8") as f:
+            f.write(
+                f"<!DOCTYPE html>\n<html lang=\"en\">\n<head>\n"
+                f"<title>Page {i}</title>\n</head>\n<body>\n"
+                f"<h1>Page {i}</h1>\n<ul>\n{anchors}</ul>\n</body>\n</html>\n"
+            )
+
+
+def write_graph_file(path, indptr, indices):
+    """
+    Writes the graph to the graph file at `path`, with pages named by
+    their number.
+    """
+    pages = [page_name(i) for i in range(len(indptr) - 1)]
+    rows = (indices[indptr[i]:indptr[i + 1]] for i in range(len(pages)))
+    outofcore.write_graph(path, pages, rows)
+
+
+def measure(function, *args):
+    """
+    Calls `function` with `args`, and returns its result, the wall time
+    in seconds and the peak memory in bytes allocated during the call.
+    Memory allocated by worker processes is not counted.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = function(*args)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def run(path, stages, samples, k=100, seed=0):
+    """
+    Loads the corpus directory or graph file at `path`, times each
+    ranking stage in `stages`, and compares its ranks with an exact
+    solution. Returns a report of graph size and, per stage, time, peak
+    memory and error.
+
+    For a directory, the crawl is also timed with `pagerank.crawl` (on
+    small corpora only), `crawler.crawl_graph` and
+    `outofcore.compile_corpus`, none of them using saved caches.
+    """
+    report = {"path": path, "stages": {}}
+    with tempfile.TemporaryDirectory() as scratch:
+        if os.path.isdir(path):
+            graph_path = os.path.join(scratch, "corpus.graph")
+            files = len(crawler.listing(path))
+            if files <= LEGACY_PAGES:
+                _, elapsed, peak = measure(pagerank.crawl, path)
+                report["stages"]["legacy-crawl"] = {"seconds": elapsed, "peak_bytes": peak}
+            graph, elapsed, peak = measure(
+                crawler.crawl_graph, path, None, False, False
+            )
+            report["stages"]["crawl"] = {"seconds": elapsed, "peak_bytes": peak}
+            _, elapsed, peak = measure(outofcore.compile_corpus, path, graph_path)
+            report["stages"]["compile"] = {"seconds": elapsed, "peak_bytes": peak}
+        else:
+            graph_path = path
+            graph, elapsed, peak = measure(LinkGraph.load, path)
+            if graph is None:
+                sys.exit(f"Not a graph file: {path}")
+            report["stages"]["load"] = {"seconds": elapsed, "peak_bytes": peak}
+        report["pages"] = len(graph)
+        report["links"] = len(graph.indices)
+        report["dangling"] = len(graph.dangling)
+
+        (exact, residuals), elapsed, _ = measure(
+            solvers.solve, graph, pagerank.DAMPING, "gauss-seidel", 1e-12, "l1", 10000
+        )
+        report["exact"] = {"seconds": elapsed, "iterations": len(residuals)}
+
+        for stage in stages:
+            if stage.startswith("legacy") and len(graph) > LEGACY_PAGES:
+                report["stages"][stage] = {"skipped": f"over {LEGACY_PAGES} pages"}
+                continue
+            if stage == "topk":
+                (top, _, iterations), elapsed, peak = measure(
+                    topk.top_ranks, graph, pagerank.DAMPING, k
+                )
+                exact_top = topk.leaders(exact, len(top))
+                report["stages"][stage] = {
+                    "seconds": elapsed, "peak_bytes": peak,
+                    "iterations": iterations,
+                    "exact_order": bool(np.array_equal(top, exact_top)),
+                    "overlap": len(set(top.tolist()) & set(exact_top.tolist())) / len(top),
+                }
+                continue
+            ranks, elapsed, peak = measure(
+                rank_stage, stage, graph, graph_path, samples, seed
+            )
+            report["stages"][stage] = {
+                "seconds": elapsed, "peak_bytes": peak,
+                "l1_error": float(np.abs(ranks - exact).sum()),
+                "max_error": float(np.abs(ranks - exact).max(initial=0)),
+            }
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    report["peak_rss_bytes"] = peak if sys.platform == "darwin" else peak * 1024
+    return report
+
+
+def rank_stage(stage, graph, graph_path, samples, seed=0):
+    """
+    Returns the rank vector of `graph` found by `stage`.
+    """
+    damping = pagerank.DAMPING
+    if stage == "iterate":
+        return power_iteration(graph, damping)
+    if stage == "partitioned":
+        workers = os.cpu_count() or 1
+        return partitioned.partitioned_iteration(graph, damping, 0.001, workers)
+    if stage in ["gauss-seidel", "quadratic"]:
+        return solvers.solve(graph, damping, stage)[0]
+    if stage == "stream":
+        return outofcore.stream_iteration(outofcore.MappedGraph(graph_path), damping)
+    if stage == "sample":
+        counts = sampling.visit_counts(graph, damping, samples, seed=seed)
+        return counts / counts.sum()
+    if stage == "parallel-sample":
+        counts = sum(sampling.sample_tasks(graph, damping, samples, seed=seed))
+        return counts / counts.sum()
+
+    corpus = {
+        page: set(graph.pages[j] for j in graph.indices[graph.indptr[i]:graph.indptr[i + 1]])
+        for i, page in enumerate(graph.pages)
+    }
+    if stage == "legacy-iterate":
+        ranks = pagerank.iterate_pagerank(corpus, damping)
+    else:
+        ranks = pagerank.sample_pagerank(corpus, damping, min(samples, pagerank.SAMPLES))
+    return np.array([ranks[page] for page in graph.pages])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from sparse import LinkGraph
+
+# Files written into the corpus directory: the links found in each page,
+# and the compiled link graph of the whole corpus
+CACHE = "pagerank.links"
+GRAPH = "pagerank.graph"
+
+# Bump whenever the link pattern or the cache layout changes
+VERSION = 1
+
+# The pattern of `pagerank.crawl`, matched on raw bytes
+LINK = re.compile(rb"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# Fewer changed files than this are parsed without a pool
+POOL_THRESHOLD = 64
+
+
+def crawl(directory, workers=None, threads=False, use_cache=True):
+    """
+    Parse a directory of HTML pages and check for links to other pages,
+    like `pagerank.crawl`, but in parallel and only for pages that
+    changed since the last crawl.
+
+    Links found in each page are cached in the directory by file name,
+    modification time and size. Changed pages are parsed in a pool of
+    `workers` processes, or threads if `threads` is true.
+    """
+    files = listing(directory)
+    links = page_links(directory, files, workers, threads, use_cache)
+    return corpus_for(links)
+
+
+def crawl_graph(directory, workers=None, threads=False, use_cache=True):
+    """
+    Returns the `LinkGraph` of the HTML pages in `directory`. The graph
+    is saved in the directory and loaded again, without parsing any
+    page, for as long as no page has changed.
+    """
+    files = listing(directory)
+    stamp = fingerprint(files)
+    path = os.path.join(directory, GRAPH)
+    if use_cache:
+        graph = LinkGraph.load(path, stamp)
+        if graph is not None:
+            return graph
+
+    links = page_links(directory, files, workers, threads, use_cache)
+    graph = LinkGraph.from_corpus(corpus_for(links))
+    if use_cache:
+        try:
+            graph.save(path, stamp)
+        except OSError:
+            pass
+    return graph
+
+
+def listing(directory):
+    """
+    Returns the (mtime_ns, size) of each HTML file in `directory`, by
+    file name, in sorted order.
+    """
+    files = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith(".html") and entry.is_file():
+                info = entry.stat()
+                files[entry.name] = (info.st_mtime_ns, info.st_size)
+    return dict(sorted(files.items()))
+
+
+def fingerprint(files):
+    """
+    Returns a 16-byte digest identifying the names and stats of `files`.
+    """
+    digest = hashlib.md5()
+    for name, (mtime, size) in files.items():
+        digest.update(f"{name}\0{mtime}\0{size}\0".encode("utf-8", "surrogateescape"))
+    return digest.digest()
+
+
+def page_links(directory, files, workers=None, threads=False, use_cache=True):
+    """
+    Returns the links in each of `files`, taken from the cache when the
+    file is unchanged and parsed otherwise, and updates the cache.
+    """
+    cached = load_cache(directory) if use_cache else {}
+    links = {}
+    changed = []
+    for name, stats in files.items():
+        entry = cached.get(name)
+        if entry is not None and tuple(entry[:2]) == stats:
+            links[name] = entry[2]
+        else:
+            changed.append(name)
+
+    paths = [os.path.join(directory, name) for name in changed]
+    if len(paths) < POOL_THRESHOLD or workers == 0:
+        parsed = map(parse_links, paths)
+        links.update(zip(changed, parsed))
+    else:
+        Pool = ThreadPoolExecutor if threads else ProcessPoolExecutor
+        chunksize = max(1, len(paths) // (4 * (workers or os.cpu_count() or 1)))
+        with Pool(workers) as pool:
+            parsed = pool.map(parse_links, paths, chunksize=chunksize)
+            links.update(zip(changed, parsed))
+
+    if use_cache and (changed or len(cached) != len(files)):
+        save_cache(directory, {
+            name: [*files[name], links[name]] for name in files
+        })
+    return links
+
+
+def parse_links(path):
+    """
+    Returns the distinct link targets in the HTML file at `path`.
+    """
+    with open(path, "rb") as f:
+        contents = f.read()
+    return sorted({
+        link.decode("utf-8", "surrogateescape")
+        for link in LINK.findall(contents)
+    })
+
+
+def corpus_for(links):
+    """
+    Returns the corpus dictionary of `crawl` given the links of each page:
+    links from a page to itself or outside the corpus are dropped.
+    """
+    return {
+        name: set(link for link in targets if link in links and link != name)
+        for name, targets in links.items()
+    }
+
+
+def load_cache(directory):
+    """
+    Returns the cached [mtime_ns, size, links] of each file, by name,
+    or an empty dictionary if there is no usable cache.
+    """
+    try:
+        with open(os.path.join(directory, CACHE), encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get("version") != VERSION:
+        return {}
+    return cache.get("files", {})
+
+
+def save_cache(directory, files):
+    """
+    Writes the [mtime_ns, size, links] of each file to the cache,
+    replacing it at once. Returns False if it could not be written.
+    """
+    path = os.path.join(directory, CACHE)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({"version": VERSION, "files": files}, f, separators=(",", ":"))
+        os.replace(temporary, path)
+    except OSError:
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Crawl a corpus of HTML pages and save its link graph."
+    )
+    parser.add_argument("directory")
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="parsing processes (default: all cores, 0 to parse in this process)"
+    )
+    parser.add_argument(
+        "--threads", action="store_true",
+        help="parse in threads instead of processes"
+    )
+    parser.add_argument(
+        "--no-cache", dest="use_cache", action="store_false",
+        help="ignore and do not update the link cache and saved graph"
+    )
+    args = parser.parse_args()
+
+    graph = crawl_graph(args.directory, args.workers, args.threads, args.use_cache)
+    print(f"{len(graph)} pages, {len(graph.indices)} links, "
+          f"{len(graph.dangling)} pages without links")
+
+
+if __name__ == "__main__":
+    main()
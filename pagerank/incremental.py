@@ -0,0 +1,231 @@
+import argparse
+import sys
+
+import numpy as np
+
+from pagerank import DAMPING, crawl
+from sparse import LinkGraph, power_iteration
+
+
+def apply_changes(graph, changes):
+    """
+    Returns a `LinkGraph` of `graph` with `changes` applied, copying the
+    links of the pages that do not change rather than compiling the
+    whole graph again.
+
+    `changes` maps a page to the new set of pages it links to, or to None
+    if the page was removed. Pages not yet in the graph are added after
+    the others, so pages keep their numbers unless an earlier page was
+    removed. As in `crawl`, links from a page to itself or outside the
+    graph are dropped.
+    """
+    n = len(graph)
+    removed = np.zeros(n, dtype=bool)
+    removed[[graph.index[page] for page, links in changes.items()
+             if links is None and page in graph.index]] = True
+    added = [page for page, links in changes.items()
+             if links is not None and page not in graph.index]
+
+    # Unless a page was removed, every page keeps its number and the
+    # index only grows
+    indptr, indices = graph.indptr, graph.indices
+    if removed.any():
+        pages = [page for page, gone in zip(graph.pages, removed.tolist()) if not gone]
+        index = {page: i for i, page in enumerate(pages)}
+        # Drop the links into removed pages, and number the rest anew
+        keep = ~removed[indices]
+        kept = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(keep, out=kept[1:])
+        indptr = kept[indptr]
+        indices = (np.cumsum(~removed) - 1)[indices[keep]]
+    else:
+        pages = list(graph.pages)
+        index = dict(graph.index)
+    for page in added:
+        index[page] = len(pages)
+        pages.append(page)
+
+    def row(page):
+        links = {index.get(link) for link in changes[page]}
+        return np.array(sorted(links - {None, index[page]}), dtype=np.int32)
+
+    # Copy the links between the rows that change, splicing in new rows
+    outdegree = np.diff(indptr)
+    pieces = []
+    end = 0
+    replaced = sorted(graph.index[page] for page in changes if page in graph.index)
+    for old in replaced:
+        page = graph.pages[old]
+        links = row(page) if changes[page] is not None else indices[:0]
+        pieces.extend([indices[end:indptr[old]], links])
+        outdegree[old] = len(links)
+        end = indptr[old + 1]
+    pieces.append(indices[end:])
+    rows = [row(page) for page in added]
+    pieces.extend(rows)
+
+    outdegree = np.concatenate([outdegree[~removed], [len(links) for links in rows]])
+    indptr = np.zeros(len(pages) + 1, dtype=np.int64)
+    np.cumsum(outdegree, out=indptr[1:])
+    return LinkGraph(pages, indptr, np.concatenate(pieces), index)
+
+
+def update_pagerank(corpus, ranks, changes, damping_factor, tolerance=0.001,
+                    localize=False):
+    """
+    Return the graph with `changes` applied, as a `LinkGraph`, and its
+    PageRank values, iterating from the previous `ranks` of `corpus`
+    rather than from the same rank for every page.
+
+    `corpus` is a `LinkGraph` or a dictionary returned by `crawl`, which
+    is compiled first, and `changes` is in the form taken by
+    `apply_changes`. Added pages start with the rank every page would
+    have under a uniform start, and the start is scaled to sum to 1.
+    Iteration stops once no value changes by more than `tolerance`, as
+    in `iterate_pagerank`. If `localize` is true, only the pages whose
+    rank is still moving are updated after the first pass (see
+    `local_iteration`), so a small edit costs about as much as the
+    region it affects.
+    """
+    graph = corpus if isinstance(corpus, LinkGraph) else LinkGraph.from_corpus(corpus)
+    start = np.fromiter(
+        (ranks.get(page, 1 / len(graph)) for page in graph.pages),
+        dtype=np.float64, count=len(graph)
+    )
+    graph, result = update_ranks(
+        graph, start, changes, damping_factor, tolerance, localize
+    )
+    return graph, graph.as_dict(result)
+
+
+def update_ranks(graph, ranks, changes, damping_factor, tolerance=0.001,
+                 localize=False):
+    """
+    Returns `graph` with `changes` applied and its rank vector, like
+    `update_pagerank`, given the rank vector `ranks` of `graph`.
+    """
+    updated = apply_changes(graph, changes)
+    start = warm_start(graph, ranks, changes, updated)
+    if localize:
+        return updated, local_iteration(updated, damping_factor, start, tolerance)
+    return updated, power_iteration(updated, damping_factor, tolerance, ranks=start)
+
+
+def warm_start(graph, ranks, changes, updated):
+    """
+    Returns the start vector of `updated`, the result of `apply_changes`
+    on `graph` and `changes`, taken from the rank vector `ranks` of
+    `graph`. Added pages start at `1 / len(updated)`, and the start is
+    scaled to sum to 1.
+    """
+    kept = np.ones(len(graph), dtype=bool)
+    kept[[graph.index[page] for page, links in changes.items()
+          if links is None and page in graph.index]] = False
+    start = np.full(len(updated), 1 / len(updated))
+    start[:int(kept.sum())] = ranks[kept]
+    total = start.sum()
+    return start / total if total > 0 else updated.uniform()
+
+
+def local_iteration(graph, damping_factor, ranks, tolerance=0.001):
+    """
+    Returns the rank vector of `graph`, updated from `ranks` until no
+    value would change by more than `tolerance` in another update, the
+    rule of `power_iteration`. The result is scaled to sum to 1.
+
+    Every page's next rank is `damping_factor` times the rank flowing in
+    over its links, plus an even share of the rank spread over the whole
+    corpus. Both are kept up to date as ranks change, so that a round
+    only visits the pages whose inputs changed, and pushes their change
+    along their own links. A page is only updated once its pending change
+    reaches `tolerance / 2`, and every page is checked again whenever the
+    share of the spread has moved by `tolerance / 2`, so no change left
+    pending can reach `tolerance`.
+    """
+    n = len(graph)
+    ranks = ranks.copy()
+    inflow = np.bincount(
+        graph.indices,
+        weights=np.repeat(ranks * graph.inverse, graph.outdegree),
+        minlength=n
+    )
+    dangling = np.zeros(n, dtype=bool)
+    dangling[graph.dangling] = True
+    spread = damping_factor * ranks[dangling].sum() + (1 - damping_factor) * ranks.sum()
+    checked_spread = spread
+    candidates = np.arange(n)
+    while len(candidates):
+        targets = damping_factor * inflow[candidates] + spread / n
+        change = targets - ranks[candidates]
+        moving = np.abs(change) >= tolerance / 2
+        pages = candidates[moving]
+        if not len(pages):
+            break
+        change = change[moving]
+        ranks[pages] = targets[moving]
+
+        sources, linked = out_links(graph, pages)
+        np.add.at(inflow, linked, (change * graph.inverse[pages])[sources])
+        spread += (
+            damping_factor * change[dangling[pages]].sum()
+            + (1 - damping_factor) * change.sum()
+        )
+        if abs(spread - checked_spread) / n >= tolerance / 2:
+            checked_spread = spread
+            candidates = np.arange(n)
+        else:
+            candidates = np.unique(linked)
+    return ranks / ranks.sum()
+
+
+def out_links(graph, pages):
+    """
+    Returns the links out of `pages` as two arrays: the position in
+    `pages` of each link's source, and the page it links to.
+    """
+    degrees = graph.outdegree[pages]
+    sources = np.repeat(np.arange(len(pages)), degrees)
+    starts = np.repeat(graph.indptr[pages] - np.cumsum(degrees) + degrees, degrees)
+    linked = graph.indices[starts + np.arange(len(sources))]
+    return sources, linked
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Re-rank a corpus after changing the links of one page."
+    )
+    parser.add_argument("corpus")
+    parser.add_argument("page", help="the page to change or add")
+    parser.add_argument("links", nargs="*", help="the pages it now links to")
+    parser.add_argument(
+        "--remove", action="store_true", help="remove the page instead"
+    )
+    parser.add_argument("--localize", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.001)
+    parser.add_argument(
+        "--check", action="store_true",
+        help="compare with a full recompute, failing if any rank is off by "
+             "more than the tolerance over (1 - damping)"
+    )
+    args = parser.parse_args()
+
+    graph = LinkGraph.from_corpus(crawl(args.corpus))
+    ranks = power_iteration(graph, DAMPING, args.tolerance)
+    changes = {args.page: None if args.remove else set(args.links)}
+    graph, ranks = update_ranks(
+        graph, ranks, changes, DAMPING, args.tolerance, args.localize
+    )
+    print(f"PageRank Results after Update")
+    for page, rank in sorted(graph.as_dict(ranks).items()):
+        print(f"  {page}: {rank:.4f}")
+
+    if args.check:
+        exact = power_iteration(graph, DAMPING, args.tolerance / 1000)
+        error = np.abs(ranks - exact).max()
+        print(f"Largest difference from a full recompute: {error:.2e}")
+        if error > args.tolerance / (1 - DAMPING) or abs(ranks.sum() - 1) >= args.tolerance:
+            sys.exit("Incremental ranks do not match a full recompute")
+
+
+if __name__ == "__main__":
+    main()
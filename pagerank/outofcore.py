@@ -0,0 +1,210 @@
+import argparse
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from crawler import listing, parse_links
+from pagerank import DAMPING
+from sparse import HEADER, MAGIC, VERSION, map_arrays
+
+# Links read from the graph file at a time during an iteration
+BLOCK = 1 << 22
+
+# Pages parsed per task when compiling in a pool
+CHUNK = 256
+
+
+class MappedGraph():
+    """
+    A graph file written by `write_graph` or `LinkGraph.save`, with its
+    links left in the file. Only the link offsets of each page are read
+    into memory; links and page names are read as they are needed.
+    """
+
+    def __init__(self, path):
+        arrays = map_arrays(path)
+        if arrays is None:
+            raise ValueError(f"{path} is not a link graph file")
+        indptr, self.name_offsets, self.indices, self.names = arrays
+        self.indptr = np.array(indptr)
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def page(self, i):
+        """
+        Returns the name of page `i`.
+        """
+        start, end = self.name_offsets[i:i + 2]
+        return str(self.names[start:end], "utf-8")
+
+    def pages(self):
+        """
+        Yields the name of each page, in order.
+        """
+        for i in range(len(self)):
+            yield self.page(i)
+
+    def blocks(self, size=BLOCK):
+        """
+        Yields the (start, end) ranges of pages whose links are read
+        together, each with about `size` links or a single page.
+        """
+        n = len(self)
+        start = 0
+        while start < n:
+            limit = self.indptr[start] + size
+            end = int(np.searchsorted(self.indptr, limit, side="right")) - 1
+            end = min(max(end, start + 1), n)
+            yield start, end
+            start = end
+
+    def step(self, ranks, damping_factor, block=BLOCK):
+        """
+        Returns the ranks after one more step of the random surfer
+        starting from `ranks`, like `LinkGraph.step`, reading the links
+        a block at a time.
+        """
+        n = len(self)
+        following = np.zeros(n)
+        dangling = 0.0
+        for start, end in self.blocks(block):
+            outdegree = np.diff(self.indptr[start:end + 1])
+            linked = outdegree > 0
+            dangling += ranks[start:end][~linked].sum()
+            shares = np.repeat(
+                ranks[start:end][linked] / outdegree[linked], outdegree[linked]
+            )
+            links = self.indices[self.indptr[start]:self.indptr[end]]
+            following += np.bincount(links, weights=shares, minlength=n)
+        spread = damping_factor * dangling + (1 - damping_factor) * ranks.sum()
+        following *= damping_factor
+        following += spread / n
+        return following
+
+
+def write_graph(path, pages, rows):
+    """
+    Writes a graph file readable by `LinkGraph.load` and `MappedGraph`
+    to `path`, for the `pages` in order and the page numbers each links
+    to in `rows`, without holding all the links in memory. `rows` may be
+    an iterator; its links are spilled to a temporary file first.
+    """
+    names = [page.encode("utf-8") for page in pages]
+    name_offsets = np.zeros(len(names) + 1, dtype="<i8")
+    np.cumsum([len(name) for name in names], out=name_offsets[1:])
+    indptr = np.zeros(len(names) + 1, dtype="<i8")
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        with tempfile.TemporaryFile(dir=directory) as spill:
+            count = 0
+            written = 0
+            for row in rows:
+                row = np.asarray(row, dtype="<i4")
+                spill.write(row.tobytes())
+                count += len(row)
+                written += 1
+                indptr[written] = count
+            if written != len(names):
+                raise ValueError("expected one row of links per page")
+            spill.seek(0)
+            header = HEADER.pack(MAGIC, VERSION, b"", len(names), count, name_offsets[-1])
+            with open(temporary, "wb") as f:
+                f.write(header)
+                f.write(indptr.tobytes())
+                f.write(name_offsets.tobytes())
+                shutil.copyfileobj(spill, f, 1 << 20)
+                for name in names:
+                    f.write(name)
+        os.replace(temporary, path)
+    except (OSError, ValueError):
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+        raise
+
+
+def compile_corpus(directory, path, workers=None):
+    """
+    Writes the link graph of the HTML pages in `directory` to the graph
+    file at `path`, with pages numbered in sorted order, parsing pages in
+    a pool of `workers` processes (0 to parse in this process). Only the
+    page names, and parsed pages not yet written, are held in memory.
+    """
+    pages = list(listing(directory))
+    index = {page: i for i, page in enumerate(pages)}
+    paths = (os.path.join(directory, page) for page in pages)
+
+    def rows(parsed):
+        for i, links in enumerate(parsed):
+            yield sorted({index[link] for link in links if link in index} - {i})
+
+    if workers == 0:
+        write_graph(path, pages, rows(map(parse_links, paths)))
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            parsed = pool.map(parse_links, paths, chunksize=CHUNK)
+            write_graph(path, pages, rows(parsed))
+
+
+def stream_iteration(graph, damping_factor, tolerance=0.001, block=BLOCK):
+    """
+    Returns the rank vector of the `MappedGraph` `graph`, iterated from
+    the same rank for every page until no value changes by more than
+    `tolerance`, reading about `block` links at a time.
+    """
+    ranks = np.full(len(graph), 1 / len(graph))
+    while True:
+        updated = graph.step(ranks, damping_factor, block)
+        change = np.abs(updated - ranks).max(initial=0)
+        ranks = updated
+        if change < tolerance:
+            return ranks
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compile a corpus to a graph file and rank it from disk."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compile_parser = commands.add_parser(
+        "compile", help="write the link graph of a corpus to a graph file"
+    )
+    compile_parser.add_argument("directory")
+    compile_parser.add_argument("graph")
+    compile_parser.add_argument(
+        "--workers", type=int, default=None,
+        help="parsing processes (default: all cores, 0 to parse in this process)"
+    )
+
+    rank_parser = commands.add_parser(
+        "rank", help="rank the pages of a graph file"
+    )
+    rank_parser.add_argument("graph")
+    rank_parser.add_argument("--tolerance", type=float, default=0.001)
+    rank_parser.add_argument(
+        "--block", type=int, default=BLOCK, help="links read at a time"
+    )
+    args = parser.parse_args()
+
+    if args.command == "compile":
+        compile_corpus(args.directory, args.graph, args.workers)
+        graph = MappedGraph(args.graph)
+        print(f"{len(graph)} pages, {len(graph.indices)} links")
+    else:
+        graph = MappedGraph(args.graph)
+        ranks = stream_iteration(graph, DAMPING, args.tolerance, args.block)
+        print(f"PageRank Results from Iteration")
+        for page, rank in zip(graph.pages(), ranks.tolist()):
+            print(f"  {page}: {rank:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import argparse
+import multiprocessing
+import multiprocessing.connection
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from pagerank import DAMPING, crawl
+from sparse import LinkGraph, power_iteration
+
+# Graphs with fewer links than this are ranked in this process
+PARALLEL_THRESHOLD = 1 << 16
+
+# Per-block values shared after each update: the largest change, and the
+# new rank of the block's dangling pages and of all its pages
+CHANGE, DANGLING, TOTAL = range(3)
+
+
+def iterate_pagerank(corpus, damping_factor, tolerance=0.001, workers=None):
+    """
+    Return PageRank values for each page by iteratively updating
+    PageRank values until convergence, like `sparse.iterate_pagerank`,
+    with the pages split into one block per worker process (all cores
+    by default).
+
+    At every update, each worker computes the new ranks of its block
+    from the previous ranks, which all workers share, and waits for the
+    others before the next update. Iteration stops once no value changes
+    by more than `tolerance` in one update.
+    """
+    graph = corpus if isinstance(corpus, LinkGraph) else LinkGraph.from_corpus(corpus)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(graph.indices) < PARALLEL_THRESHOLD:
+        ranks = power_iteration(graph, damping_factor, tolerance)
+    else:
+        ranks = partitioned_iteration(graph, damping_factor, tolerance, workers)
+    return graph.as_dict(ranks)
+
+
+def partitions(graph, workers):
+    """
+    Returns the page bounds of `workers` blocks of consecutive pages with
+    about the same number of pages plus links into them, and the bounds
+    of the links into each block in `graph.inflow` order.
+    """
+    indegree = np.bincount(graph.indices, minlength=len(graph))
+    links = np.zeros(len(graph) + 1, dtype=np.int64)
+    np.cumsum(indegree, out=links[1:])
+    work = links + np.arange(len(graph) + 1)
+    shares = np.linspace(0, work[-1], workers + 1)
+    pages = np.searchsorted(work, shares)
+    pages[0], pages[-1] = 0, len(graph)
+    return pages.tolist(), links[pages].tolist()
+
+
+def partitioned_iteration(graph, damping_factor, tolerance, workers):
+    """
+    Returns the rank vector of `graph` found by `iterate_pagerank` with
+    `workers` processes sharing the ranks and the links sorted by target.
+    Raises RuntimeError if a worker fails.
+    """
+    n = len(graph)
+    sources, _, _ = graph.inflow
+    dangling = np.zeros(n, dtype=bool)
+    dangling[graph.dangling] = True
+    ranks = graph.uniform()
+    pages, links = partitions(graph, workers)
+
+    arrays = {
+        "sources": sources,
+        "targets": np.sort(graph.indices),
+        "inverse": graph.inverse,
+        "dangling": dangling,
+        "ranks": np.stack([ranks, np.zeros(n)]),
+        "blocks": np.zeros((2, workers, 3)),
+        "iterations": np.zeros(1, dtype=np.int64),
+    }
+    shared = {}
+    try:
+        for name, array in arrays.items():
+            memory = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+            shared[name] = (memory, array.shape, array.dtype.str)
+            np.ndarray(array.shape, array.dtype, memory.buf)[...] = array
+        blocks = view(shared["blocks"])
+        blocks[0, 0, DANGLING] = ranks[dangling].sum()
+        blocks[0, 0, TOTAL] = ranks.sum()
+        del blocks
+
+        if "fork" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("fork")
+        else:
+            context = multiprocessing.get_context()
+        barrier = context.Barrier(workers)
+        processes = [
+            context.Process(
+                target=rank_block,
+                args=(shared, w, pages[w:w + 2], links[w:w + 2], barrier,
+                      damping_factor, tolerance)
+            )
+            for w in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        try:
+            supervise(processes, barrier)
+        finally:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+
+        iterations = int(view(shared["iterations"])[0])
+        return view(shared["ranks"])[iterations % 2].copy()
+    finally:
+        for memory, _, _ in shared.values():
+            memory.close()
+            memory.unlink()
+
+
+def supervise(processes, barrier):
+    """
+    Waits for every process to exit. If one fails, even by being killed
+    where it cannot abort `barrier` itself, aborts the barrier so that
+    the others stop waiting at it, and raises RuntimeError.
+    """
+    running = {process.sentinel: process for process in processes}
+    while running:
+        for sentinel in multiprocessing.connection.wait(list(running)):
+            process = running.pop(sentinel)
+            process.join()
+            if process.exitcode != 0:
+                barrier.abort()
+                raise RuntimeError(
+                    f"a PageRank worker failed with exit code {process.exitcode}"
+                )
+
+
+def view(entry):
+    """
+    Returns the array held in a (shared memory, shape, dtype) entry.
+    """
+    memory, shape, dtype = entry
+    return np.ndarray(shape, np.dtype(dtype), memory.buf)
+
+
+def rank_block(shared, worker, pages, links, barrier, damping_factor, tolerance):
+    """
+    Runs one worker of `partitioned_iteration`: updates the ranks of the
+    pages in [pages[0], pages[1]) until every block has converged.
+
+    Ranks and per-block values are double-buffered by update number, so
+    a buffer is only rewritten once every worker has passed the barrier
+    after the update that read it.
+    """
+    start, end = pages
+    first, last = links
+    sources = view(shared["sources"])[first:last]
+    targets = view(shared["targets"])[first:last] - start
+    inverse = view(shared["inverse"])
+    dangling = view(shared["dangling"])[start:end]
+    ranks = view(shared["ranks"])
+    blocks = view(shared["blocks"])
+    n = ranks.shape[1]
+
+    try:
+        iteration = 0
+        while True:
+            current, updated = ranks[iteration % 2], ranks[(iteration + 1) % 2]
+            totals = blocks[iteration % 2]
+            spread = (
+                damping_factor * totals[:, DANGLING].sum()
+                + (1 - damping_factor) * totals[:, TOTAL].sum()
+            )
+            shares = current[sources] * inverse[sources]
+            following = np.bincount(targets, weights=shares, minlength=end - start)
+            following *= damping_factor
+            following += spread / n
+            updated[start:end] = following
+
+            summary = blocks[(iteration + 1) % 2, worker]
+            summary[CHANGE] = np.abs(following - current[start:end]).max(initial=0)
+            summary[DANGLING] = following[dangling].sum()
+            summary[TOTAL] = following.sum()
+            iteration += 1
+            barrier.wait()
+            if blocks[iteration % 2, :, CHANGE].max() < tolerance:
+                break
+        if worker == 0:
+            view(shared["iterations"])[0] = iteration
+    except BaseException:
+        barrier.abort()
+        raise
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rank the pages of a corpus with one block per core."
+    )
+    parser.add_argument("corpus")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--tolerance", type=float, default=0.001)
+    args = parser.parse_args()
+
+    ranks = iterate_pagerank(crawl(args.corpus), DAMPING, args.tolerance, args.workers)
+    print(f"PageRank Results from Iteration")
+    for page in sorted(ranks):
+        print(f"  {page}: {ranks[page]:.4f}")
+
+
+if __name__ == "__main__":
+    main()
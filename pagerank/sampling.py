@@ -0,0 +1,250 @@
+import argparse
+import multiprocessing
+
+import numpy as np
+
+from pagerank import DAMPING, SAMPLES, crawl
+from sparse import LinkGraph
+
+# Random surfers advanced together at each step
+WALKERS = 1024
+
+# Visited pages buffered before they are counted
+CHUNK = 1 << 20
+
+# Most samples taken by each task of a parallel run
+TASK_SAMPLES = 1 << 18
+
+# Fewest tasks a run is split into, so progressive estimates have a spread
+MIN_TASKS = 8
+
+# Largest share of a task's samples spent finishing walks once it is done
+OVERSHOOT = 0.25
+
+# z-score of the confidence intervals reported by progressive_pagerank
+Z95 = 1.96
+
+# The graph sampled by a pool worker, set by init_worker
+worker_graph = None
+
+
+def sample_pagerank(corpus, damping_factor, n, walkers=WALKERS, seed=None):
+    """
+    Return PageRank values for each page by sampling about `n` pages,
+    like `pagerank.sample_pagerank`, but with `walkers` surfers moving
+    at once over a compiled `LinkGraph`.
+
+    `corpus` is either the dictionary returned by `crawl` or a
+    `LinkGraph`. `seed` makes the result reproducible.
+    """
+    graph = corpus if isinstance(corpus, LinkGraph) else LinkGraph.from_corpus(corpus)
+    counts = visit_counts(graph, damping_factor, n, walkers, seed)
+    return graph.as_dict(counts / counts.sum())
+
+
+def visit_counts(graph, damping_factor, n, walkers=WALKERS, seed=None):
+    """
+    Returns how many times random surfers visited each page of `graph`
+    over at least `n` samples. `seed` is a seed or a NumPy `Generator`.
+
+    Every surfer starts on a random page. Once `n` pages have been
+    visited in total, each surfer stops at its next jump to a random
+    page, so that no walk is cut short. Cutting walks short would
+    undercount the pages that walks take many steps to reach. Walks then
+    overshoot `n` by about `walkers / (1 - damping_factor)` samples.
+    """
+    rng = np.random.default_rng(seed)
+    size = len(graph)
+    counts = np.zeros(size, dtype=np.int64)
+    positions = rng.integers(size, size=max(1, min(walkers, n)))
+    visited = []
+    buffered = 0
+    taken = 0
+    while len(positions):
+        visited.append(positions)
+        buffered += len(positions)
+        taken += len(positions)
+        if buffered >= CHUNK:
+            counts += np.bincount(np.concatenate(visited), minlength=size)
+            visited = []
+            buffered = 0
+        positions, jumped = advance(graph, positions, damping_factor, rng)
+        if taken >= n:
+            positions = positions[~jumped]
+    if visited:
+        counts += np.bincount(np.concatenate(visited), minlength=size)
+    return counts
+
+
+def advance(graph, positions, damping_factor, rng):
+    """
+    Returns the next page of the surfers on `positions`, and which of
+    them jumped to a random page rather than following a link.
+
+    All choices are drawn in bulk: a surfer follows a link with
+    probability `damping_factor` if its page has links, and the link is
+    picked by offset into the page's row of `graph.indices`.
+    """
+    degrees = graph.outdegree[positions]
+    follow = (rng.random(len(positions)) < damping_factor) & (degrees > 0)
+    following = np.flatnonzero(follow)
+    offsets = (rng.random(len(following)) * degrees[following]).astype(np.int64)
+    pages = rng.integers(len(graph), size=len(positions))
+    pages[following] = graph.indices[graph.indptr[positions[following]] + offsets]
+    return pages, ~follow
+
+
+def parallel_sample_pagerank(corpus, damping_factor, n, workers=None, seed=None,
+                             walkers=WALKERS, task_samples=None):
+    """
+    Return PageRank values for each page by sampling about `n` pages,
+    like `sample_pagerank`, spread over `workers` processes (all cores
+    by default, 1 to sample in this process).
+
+    The samples are split into tasks of `task_samples` (by default
+    `task_size(n)`), each with its own random stream spawned from `seed`,
+    so a seeded result does not depend on the number of workers.
+    """
+    graph = corpus if isinstance(corpus, LinkGraph) else LinkGraph.from_corpus(corpus)
+    counts = sum(sample_tasks(
+        graph, damping_factor, n, workers, seed, walkers, task_samples
+    ))
+    return graph.as_dict(counts / counts.sum())
+
+
+def progressive_pagerank(corpus, damping_factor, n, workers=None, seed=None,
+                         walkers=WALKERS, task_samples=None):
+    """
+    Yields running estimates while sampling as `parallel_sample_pagerank`
+    does, one after each task in task order, as (samples, ranks, margins).
+
+    `ranks` is the estimate from all `samples` taken so far and `margins`
+    the half-width of its 95% confidence interval for each page, from
+    the spread between tasks (infinite until two tasks are done). Each
+    task is a batch of whole walks, so its estimates are independent of
+    the other tasks even though visits within a walk are not.
+    """
+    graph = corpus if isinstance(corpus, LinkGraph) else LinkGraph.from_corpus(corpus)
+    total = np.zeros(len(graph), dtype=np.int64)
+    mean = np.zeros(len(graph))
+    squares = np.zeros(len(graph))
+    tasks = 0
+    for counts in sample_tasks(
+        graph, damping_factor, n, workers, seed, walkers, task_samples
+    ):
+        total += counts
+        tasks += 1
+        estimate = counts / counts.sum()
+        delta = estimate - mean
+        mean += delta / tasks
+        squares += delta * (estimate - mean)
+        if tasks > 1:
+            margins = Z95 * np.sqrt(squares / (tasks - 1) / tasks)
+        else:
+            margins = np.full(len(graph), np.inf)
+        samples = int(total.sum())
+        yield samples, graph.as_dict(total / samples), graph.as_dict(margins)
+
+
+def sample_tasks(graph, damping_factor, n, workers=None, seed=None,
+                 walkers=WALKERS, task_samples=None):
+    """
+    Yields the visit counts of each task of a parallel run, in order.
+    """
+    if task_samples is None:
+        task_samples = task_size(n)
+    sizes = [task_samples] * (n // task_samples)
+    if n % task_samples or not sizes:
+        sizes.append(n % task_samples or n)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [
+        (damping_factor, size, task_walkers(size, damping_factor, walkers), task_seed)
+        for size, task_seed in zip(sizes, seeds)
+    ]
+    if workers == 1 or len(tasks) == 1:
+        init_worker(graph)
+        try:
+            yield from map(sample_task, tasks)
+        finally:
+            init_worker(None)
+        return
+
+    context = multiprocessing.get_context()
+    with context.Pool(workers, init_worker, (graph,)) as pool:
+        yield from pool.imap(sample_task, tasks)
+
+
+def task_size(n):
+    """
+    Returns the samples taken by each task of a run of `n` samples:
+    enough tasks for at least `MIN_TASKS`, of at most `TASK_SAMPLES`.
+    """
+    return max(1, min(TASK_SAMPLES, -(-n // MIN_TASKS)))
+
+
+def task_walkers(samples, damping_factor, walkers=WALKERS):
+    """
+    Returns how many of `walkers` surfers a task of `samples` starts,
+    fewer for small tasks so that finishing their walks, about
+    `walkers / (1 - damping_factor)` samples, overshoots the task by at
+    most `OVERSHOOT` of its samples.
+    """
+    return max(1, min(walkers, int(samples * (1 - damping_factor) * OVERSHOOT)))
+
+
+def init_worker(graph):
+    """
+    Sets the graph sampled by `sample_task` in this process.
+    """
+    global worker_graph
+    worker_graph = graph
+
+
+def sample_task(task):
+    """
+    Returns the visit counts of one (damping_factor, samples, walkers,
+    seed) task over `worker_graph`.
+    """
+    damping_factor, samples, walkers, seed = task
+    return visit_counts(worker_graph, damping_factor, samples, walkers, seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Estimate the PageRank of a corpus by random sampling."
+    )
+    parser.add_argument("corpus")
+    parser.add_argument("samples", nargs="?", type=int, default=SAMPLES)
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="sampling processes (default: 1, 0 for all cores)"
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--progress", action="store_true",
+        help="print running estimates with 95%% confidence intervals"
+    )
+    args = parser.parse_args()
+
+    corpus = crawl(args.corpus)
+    n = args.samples
+    workers = args.workers or None
+    if args.progress:
+        for samples, ranks, margins in progressive_pagerank(
+            corpus, DAMPING, n, workers, args.seed
+        ):
+            print(f"PageRank Estimates after {samples} samples")
+            for page in sorted(ranks):
+                print(f"  {page}: {ranks[page]:.4f} ± {margins[page]:.4f}")
+        return
+    if workers == 1:
+        ranks = sample_pagerank(corpus, DAMPING, n, seed=args.seed)
+    else:
+        ranks = parallel_sample_pagerank(corpus, DAMPING, n, workers, args.seed)
+    print(f"PageRank Results from Sampling (n = {n})")
+    for page in sorted(ranks):
+        print(f"  {page}: {ranks[page]:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import argparse
+
+import numpy as np
+
+from pagerank import DAMPING, crawl
+from sparse import LinkGraph
+
+# Ways solve_pagerank can update the ranks
+METHODS = ["jacobi", "gauss-seidel", "quadratic"]
+
+# Pages updated together in one Gauss-Seidel step
+SWEEP_BLOCK = 1024
+
+# Jacobi updates between extrapolations
+PERIOD = 10
+
+
+def solve_pagerank(corpus, damping_factor, method="jacobi", tolerance=1e-6,
+                   norm="l1", max_iterations=1000):
+    """
+    Return PageRank values for each page like `iterate_pagerank`, along
+    with the number of updates made and the residual after each one.
+
+    `method` is one of `METHODS`:
+    - jacobi: every page is updated from the previous ranks
+    - gauss-seidel: pages are updated in place, in blocks of
+      `SWEEP_BLOCK`, from the newest ranks of the pages linking to them
+    - quadratic: jacobi, with the ranks extrapolated towards their
+      limit every `PERIOD` updates. An extrapolation is undone if the
+      update after it changes the ranks more than the update before it
+      did, and extrapolation stops from then on, so that this takes at
+      most one update more than jacobi.
+
+    The residual of an update is how much it changed the ranks, summed
+    over pages (`norm` "l1") or the largest single change ("max", the
+    rule of `iterate_pagerank`). Updates stop once it is below
+    `tolerance`, or after `max_iterations`.
+    """
+    graph = corpus if isinstance(corpus, LinkGraph) else LinkGraph.from_corpus(corpus)
+    ranks, residuals = solve(
+        graph, damping_factor, method, tolerance, norm, max_iterations
+    )
+    return graph.as_dict(ranks), len(residuals), residuals
+
+
+def solve(graph, damping_factor, method="jacobi", tolerance=1e-6, norm="l1",
+          max_iterations=1000):
+    """
+    Returns the rank vector of `graph` found as `solve_pagerank` does,
+    and the residual after each update.
+    """
+    if method not in METHODS:
+        raise ValueError(f"unknown method {method!r}")
+    if norm not in ["l1", "max"]:
+        raise ValueError(f"unknown norm {norm!r}")
+
+    ranks = graph.uniform()
+    history = [ranks]
+    residuals = []
+    extrapolating = method == "quadratic"
+    fallback = None
+    while len(residuals) < max_iterations:
+        if method == "gauss-seidel":
+            updated = sweep(graph, ranks, damping_factor)
+        else:
+            updated = graph.step(ranks, damping_factor)
+        residuals.append(residual(updated - ranks, norm))
+        if residuals[-1] < tolerance:
+            ranks = updated
+            break
+        if fallback is not None and residuals[-1] >= residuals[-2]:
+            # The extrapolation set convergence back: return to the ranks
+            # it replaced, and extrapolate no more
+            ranks, fallback = fallback, None
+            extrapolating = False
+            continue
+        ranks, fallback = updated, None
+        if extrapolating:
+            history = history[-3:] + [ranks]
+            if len(residuals) % PERIOD == 0:
+                if len(history) == 4:
+                    fallback, ranks = ranks, quadratic(*history)
+                history = [ranks]
+    return ranks, residuals
+
+
+def residual(change, norm="l1"):
+    """
+    Returns the size of `change` in `norm`, "l1" or "max".
+    """
+    if norm == "l1":
+        return float(np.abs(change).sum())
+    return float(np.abs(change).max(initial=0))
+
+
+def sweep(graph, ranks, damping_factor, block=SWEEP_BLOCK):
+    """
+    Returns the ranks after one Gauss-Seidel sweep over `graph`, taking
+    `block` pages at a time in order. Each block is computed from the
+    ranks already updated earlier in the sweep.
+
+    The rank spread over every page is kept current as blocks change, so
+    the sweep solves the same equations as `LinkGraph.step` with ranks
+    that sum to 1. The result is scaled to sum to 1.
+    """
+    n = len(graph)
+    ranks = ranks.copy()
+    sources, targets, starts = graph.inflow
+    bounds = np.append(starts, len(sources))
+    dangling = np.zeros(n, dtype=bool)
+    dangling[graph.dangling] = True
+    spread = damping_factor * ranks[dangling].sum() + (1 - damping_factor)
+
+    for start in range(0, n, block):
+        end = min(start + block, n)
+        first, last = np.searchsorted(targets, [start, end])
+        following = np.zeros(end - start)
+        if last > first:
+            links = slice(bounds[first], bounds[last])
+            shares = ranks[sources[links]] * graph.inverse[sources[links]]
+            following[targets[first:last] - start] = np.add.reduceat(
+                shares, starts[first:last] - bounds[first]
+            )
+        updated = damping_factor * following + spread / n
+        spread += damping_factor * (updated - ranks[start:end])[dangling[start:end]].sum()
+        ranks[start:end] = updated
+    return ranks / ranks.sum()
+
+
+def quadratic(first, second, third, fourth):
+    """
+    Returns the quadratic extrapolation (Kamvar et al.) of four
+    successive rank vectors: the combination of the last three that
+    cancels the two slowest-decaying error terms.
+    """
+    y = np.column_stack([second - first, third - first])
+    gamma, *_ = np.linalg.lstsq(y, -(fourth - first), rcond=None)
+    beta = [gamma[0] + gamma[1] + 1, gamma[1] + 1, 1]
+    ranks = beta[0] * second + beta[1] * third + beta[2] * fourth
+    ranks = np.where(ranks > 0, ranks, fourth)
+    return ranks / ranks.sum()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rank the pages of a corpus and report convergence."
+    )
+    parser.add_argument("corpus")
+    parser.add_argument("--method", choices=METHODS, default="jacobi")
+    parser.add_argument("--tolerance", type=float, default=1e-6)
+    parser.add_argument("--norm", choices=["l1", "max"], default="l1")
+    parser.add_argument("--max-iterations", type=int, default=1000)
+    args = parser.parse_args()
+
+    ranks, iterations, residuals = solve_pagerank(
+        crawl(args.corpus), DAMPING, args.method, args.tolerance,
+        args.norm, args.max_iterations
+    )
+    print(f"PageRank Results from {args.method} ({iterations} iterations, "
+          f"residual {residuals[-1]:.2e})")
+    for page in sorted(ranks):
+        print(f"  {page}: {ranks[page]:.4f}")
+
+
+if __name__ == "__main__":
+    main()
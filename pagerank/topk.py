@@ -0,0 +1,89 @@
+import argparse
+
+import numpy as np
+
+from pagerank import DAMPING, crawl
+from sparse import LinkGraph
+
+
+def top_pagerank(corpus, damping_factor, k=100, ordered=True, tolerance=1e-9):
+    """
+    Return the `k` pages with the highest PageRank, as a list of
+    (page, rank) pairs from highest to lowest rank.
+
+    Iteration stops as soon as the ranks can no longer move far enough
+    for another page to enter the top `k` or, if `ordered`, for two of
+    the top `k` to swap places. Pages whose ranks are tied can never be
+    told apart, so iteration also stops once no rank can move by more
+    than `tolerance`.
+    """
+    graph = corpus if isinstance(corpus, LinkGraph) else LinkGraph.from_corpus(corpus)
+    top, ranks, _ = top_ranks(graph, damping_factor, k, ordered, tolerance)
+    return [(graph.pages[i], rank) for i, rank in zip(top.tolist(), ranks.tolist())]
+
+
+def top_ranks(graph, damping_factor, k=100, ordered=True, tolerance=1e-9):
+    """
+    Returns the numbers of the top `k` pages of `graph` and their ranks,
+    from highest to lowest, and the number of updates made.
+
+    Each update shrinks the distance to the exact ranks, summed over
+    pages, by at least `damping_factor`. So no rank is further from its
+    exact value than `damping_factor / (1 - damping_factor)` times the
+    summed change of the last update. The top `k` are settled once the
+    gaps around them are more than twice that bound.
+    """
+    n = len(graph)
+    k = min(k, n)
+    ranks = graph.uniform()
+    iterations = 0
+    while True:
+        updated = graph.step(ranks, damping_factor)
+        iterations += 1
+        bound = damping_factor / (1 - damping_factor) * np.abs(updated - ranks).sum()
+        ranks = updated
+        top = leaders(ranks, k + 1)
+        values = ranks[top]
+        if bound <= tolerance:
+            break
+        if k < n and values[k - 1] - values[k] <= 2 * bound:
+            continue
+        if ordered and np.any(values[:k - 1] - values[1:k] <= 2 * bound):
+            continue
+        break
+    top = top[:k]
+    return top, ranks[top], iterations
+
+
+def leaders(ranks, count):
+    """
+    Returns the numbers of the `count` highest values in `ranks`, from
+    highest to lowest.
+    """
+    if count < len(ranks):
+        top = np.argpartition(ranks, -count)[-count:]
+    else:
+        top = np.arange(len(ranks))
+    return top[np.argsort(-ranks[top], kind="stable")]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="List the pages of a corpus with the highest PageRank."
+    )
+    parser.add_argument("corpus")
+    parser.add_argument("-k", type=int, default=100)
+    parser.add_argument(
+        "--unordered", dest="ordered", action="store_false",
+        help="stop once the top k pages are known, in any order"
+    )
+    args = parser.parse_args()
+
+    top = top_pagerank(crawl(args.corpus), DAMPING, args.k, args.ordered)
+    print(f"Top {len(top)} PageRank Results")
+    for page, rank in top:
+        print(f"  {page}: {rank:.4f}")
+
+
+if __name__ == "__main__":
+    main()